@@ -1,144 +1,254 @@
-import States as S
-import Expressions as E
-from Expressions import Exp
-from util import parse, TrainGate
-
-CONST = E.CONST
-PROP = E.PROP
-NEG = E.NEG
-DISJ = E.DISJ
-CONJ = E.CONJ
-IMPL =  E.IMPL
-CIRCLE = E.CIRCLE
-DIAMOND = E.DIAMOND
-SQUARE = E.SQUARE
-UNTIL = E.UNTIL
-AVOID = E.AVOID  # Not Implemented
-
-
-
-# Here's the initial setup of the Train-Gate problem
-players = ['t', 'c']
-
-q0 = S.State(['oog'], 't')
-q1 = S.State(['oog', 'req'], 'c')
-q2 = S.State(['oog', 'grant'], 't')
-q3 = S.State(['ig'], 'c')
-
-q0.connect([q0, q1])
-q1.connect([q0, q1, q2])
-q2.connect([q0, q3])
-q3.connect([q0, q3])
-
-all_states = [q0, q1, q2, q3]
-
-# Some examples of the first statement on slide 28 of the reference (Bloisi in bibliography of paper)
-#  {0}[]((out_of_gate ^ ~grant) -> {c}[](out_of_gate))
-#  where [] represents the square path operator, {A} represents that set A of
-#  players is the "protagonist" of the expression
-# The Exp instances below are the constituent expressions that build the given expression
-#   which is represented by total
-true = Exp(True, op=CONST)
-oog = Exp('oog')
-grant = Exp('grant')
-ngrant = Exp(grant, op=NEG)
-pand = Exp(oog, ngrant, CONJ)
-path = Exp(oog, op=(SQUARE, ['c']))
-impl = Exp(pand, path, IMPL)
-total = Exp(impl, op=(SQUARE, []))
-# This can be accomplished with less effort by using the parse function:
-print('_'*31+f'Begin Example'+'_'*31)
-expression_str = '{0}[]((oog ^ ~grant) -> {c}[](oog))'
-print(f'Expression String:\t{expression_str}')
-parsed_total = parse(expression_str) # recreating the expression "total" by using the parser
-print(f'Parsed Exp Repr:\t{parsed_total}')
-print(f'Total Exp Repr:\t\t{total}')
-# You can see that total and parsed_total are equivalent
-print(f'Equal: {total == parsed_total}')
-print('_'*32+'End Example'+'_'*32+'\n')
-
-# When writing your own expressions as strings, please refer to the docstring below for syntax:
-'''Expression String Representation Syntax
-    
-    Regular Operators:
-        Constant    :   "true"
-                        "false"
-        Proposition :   any string of characters
-        Negation    :   ~
-        Disjunction :   V
-        Conjunction :   ^
-        Implication :   ->
-        
-    Path Quantifiers:
-        Players :   {_}
-                    {_,...}
-                    {} or {0}
-                    
-        *   If players is parametrized with "0", i.e. "{0}", it will behave
-            the same as {} as 0 is the symbol for null.
-        *   Path Quantifiers must apply to expressions within parenthesis,
-            for example, "{c}[](oog)" is legal but "{c}[]oog" is not.
-        
-    Temporal Operators:
-        Circle  :   @
-        Diamond :   <>
-        Square  :   []
-        Until   :   U
-        
-        *   Circle, Diamond, and Square apply from the left of an expression, 
-            Until is infix.
-        *   Temporal Operators must apply to expressions within parenthesis,
-            for example, "{c}[](oog)" is legal but "{c}[]oog" is not.
-        *   Temporal Operators can only come after Path Quantifiers. 
-            Until looks like {_}(exp1) U (exp2). 
-            
-    _______________________________________________________________________________
-    
-    Below are examples to assist in expression construction:
-    
-    Usage Examples:
-        Players:              {c,t}[](oog ^ grant)
-        Temporal Operators:   {0}_(oog ^ grant)     where _ is [], @, or <>
-        Until:                {c}(oog ^ grant) U (oog V grant)
-        
-    Various Train-Gate Examples:
-        *   {0}[]((oog ^ ~grant) -> {c,t}[](oog))
-        *   {0}[](oog -> {c,t}<>(ig))
-        *   {0}[](oog -> {t}<>(req ^ ({c}<>(grant)) ^ ({c}[](~grant)))'
-        *   {0}[](ig -> {c}@(oog))'
-'''
-
-
-def test(exp, states=all_states):
-    return [exp.check(i) for i in states]
-
-
-def is_valid(exp, states):
-    if type(exp) is str:
-        exp = parse(exp)
-    out = True
-    for state_res in [exp.check(i) for i in states]:
-        out = out and state_res
-    return out
-
-
-if __name__ == '__main__':
-    # Below are the Train-Gate Problem examples from Bloisi's slides:
-    # *  The formulas can be accessed through TG.examples,
-    #    the text descriptions can be accessed through TG.descriptions,
-    #    and the state graph can be accessed through TG.states.
-    #
-    # *  The formulas can be evaluated by a certain property test (i.e., is_valid)
-    #    this can be achieved by using TG.print(f=<property_test>) which will evaluate
-    #    all formulas in the set against the system of states with the given property test.
-    #
-    # *  Formulas can be added through TG.add_example(e, t=None) where e is the text
-    #    representation of the formula and t is an option text description of the formula.
-    TG = TrainGate()
-    TG.print(f=test)
-    TG.print(f=is_valid)
-
-    # To create your own system and expressions you can create a new State graph
-    # in the same way as it is done earlier in this file.
-    # Use the Expression String Representation Syntax to create expressions and
-    # then use the parse function to get an Exp representation of the expression.
+import States as S
+import Expressions as E
+import Fixpoint as F
+import Game as G
+import Counterexample as C
+import Results as R
+import Symbolic as Y
+import Parallel as P
+import Concurrent as K
+from Expressions import Exp
+from Batch import check_many
+from util import parse, TrainGate
+
+CONST = E.CONST
+PROP = E.PROP
+NEG = E.NEG
+DISJ = E.DISJ
+CONJ = E.CONJ
+IMPL =  E.IMPL
+CIRCLE = E.CIRCLE
+DIAMOND = E.DIAMOND
+SQUARE = E.SQUARE
+UNTIL = E.UNTIL
+AVOID = E.AVOID  # Not Implemented
+
+
+
+# Here's the initial setup of the Train-Gate problem
+players = ['t', 'c']
+
+q0 = S.State(['oog'], 't')
+q1 = S.State(['oog', 'req'], 'c')
+q2 = S.State(['oog', 'grant'], 't')
+q3 = S.State(['ig'], 'c')
+
+q0.connect([q0, q1])
+q1.connect([q0, q1, q2])
+q2.connect([q0, q3])
+q3.connect([q0, q3])
+
+all_states = [q0, q1, q2, q3]
+
+# Some examples of the first statement on slide 28 of the reference (Bloisi in bibliography of paper)
+#  {0}[]((out_of_gate ^ ~grant) -> {c}[](out_of_gate))
+#  where [] represents the square path operator, {A} represents that set A of
+#  players is the "protagonist" of the expression
+# The Exp instances below are the constituent expressions that build the given expression
+#   which is represented by total
+true = Exp(True, op=CONST)
+oog = Exp('oog')
+grant = Exp('grant')
+ngrant = Exp(grant, op=NEG)
+pand = Exp(oog, ngrant, CONJ)
+path = Exp(oog, op=(SQUARE, ['c']))
+impl = Exp(pand, path, IMPL)
+total = Exp(impl, op=(SQUARE, []))
+# This can be accomplished with less effort by using the parse function:
+print('_'*31+f'Begin Example'+'_'*31)
+expression_str = '{0}[]((oog ^ ~grant) -> {c}[](oog))'
+print(f'Expression String:\t{expression_str}')
+parsed_total = parse(expression_str) # recreating the expression "total" by using the parser
+print(f'Parsed Exp Repr:\t{parsed_total}')
+print(f'Total Exp Repr:\t\t{total}')
+# You can see that total and parsed_total are equivalent
+print(f'Equal: {total == parsed_total}')
+print('_'*32+'End Example'+'_'*32+'\n')
+
+# When writing your own expressions as strings, please refer to the docstring below for syntax:
+'''Expression String Representation Syntax
+    
+    Regular Operators:
+        Constant    :   "true"
+                        "false"
+        Proposition :   any string of characters
+        Negation    :   ~
+        Disjunction :   V
+        Conjunction :   ^
+        Implication :   ->
+        
+    Path Quantifiers:
+        Players :   {_}
+                    {_,...}
+                    {} or {0}
+                    
+        *   If players is parametrized with "0", i.e. "{0}", it will behave
+            the same as {} as 0 is the symbol for null.
+        *   Path Quantifiers must apply to expressions within parenthesis,
+            for example, "{c}[](oog)" is legal but "{c}[]oog" is not.
+        
+    Temporal Operators:
+        Circle  :   @
+        Diamond :   <>
+        Square  :   []
+        Until   :   U
+        
+        *   Circle, Diamond, and Square apply from the left of an expression, 
+            Until is infix.
+        *   Temporal Operators must apply to expressions within parenthesis,
+            for example, "{c}[](oog)" is legal but "{c}[]oog" is not.
+        *   Temporal Operators can only come after Path Quantifiers. 
+            Until looks like {_}(exp1) U (exp2) or {_}(exp1 U exp2).
+            
+    _______________________________________________________________________________
+    
+    Below are examples to assist in expression construction:
+    
+    Usage Examples:
+        Players:              {c,t}[](oog ^ grant)
+        Temporal Operators:   {0}_(oog ^ grant)     where _ is [], @, or <>
+        Until:                {c}(oog ^ grant) U (oog V grant)
+        
+    Various Train-Gate Examples:
+        *   {0}[]((oog ^ ~grant) -> {c,t}[](oog))
+        *   {0}[](oog -> {c,t}<>(ig))
+        *   {0}[](oog -> {t}<>(req ^ ({c}<>(grant)) ^ ({c}[](~grant)))'
+        *   {0}[](ig -> {c}@(oog))'
+'''
+
+
+# engine selects the model checking algorithm:
+#   'dfs'       Exp.check, a depth-first search from every state, memoized per strongly connected component
+#   'fixpoint'  Fixpoint.label, labels the whole model bottom-up in polynomial time,
+#               states may also be a Game from Game.compile
+#   'symbolic'  Symbolic.label, the same labeling on BDDs of the model (see Symbolic.Model for models given
+#               as BDDs to begin with, e.g. Symbolic.train_gate), states may also be a Game
+#   'parallel'  Parallel.label, the fixpoint labeling split between processes, one per core, for models of
+#               millions of states (keep a Parallel.Cluster for several formulas), states may also be a Game
+# states may also be a Concurrent.Structure, a game where all agents move at once, which is always labeled
+#  by Concurrent.label (engine, cache and results don't apply to it)
+# cache is an optional Expressions.EvalCache shared between calls, so subformulas common to
+#  several formulas are only evaluated once per state
+# profile is an optional Expressions.Profile that collects per subformula and per operator statistics,
+#  print it or read profile.report()
+# results is an optional Results.ResultCache, a file of earlier results that is looked up first and that
+#  gets the new ones; model is Results.model_key(states) when the caller has it already (compiling and
+#  hashing the model costs about as much as a check), it must be made again after the model is edited
+def test(exp, states=all_states, engine='dfs', cache=None, profile=None, results=None, model=None):
+    if isinstance(states, K.Structure):
+        return K.label(exp, states, profile)
+    if results is not None:
+        keys = R.fingerprints(exp, states, model)
+        out = results.labels(*keys)
+        if out is None:
+            out = test(exp, states, engine, cache, profile)
+            results.put_labels(keys[0], keys[1], out)
+        return out
+    if engine == 'fixpoint':
+        return F.label(exp, states, cache, profile)
+    if engine == 'symbolic':
+        return Y.label(exp, states, profile)
+    if engine == 'parallel':
+        return P.label(exp, states, profile=profile)
+    components = cache.components if cache is not None else S.Components()  # found once for all states
+    return [exp.check(i, cache, profile, components) for i in states]
+
+
+def is_valid(exp, states, engine='dfs', cache=None, profile=None, results=None, model=None):
+    # stops at the first state where exp fails (the fixpoint engines label every state at once anyway)
+    if type(exp) is str:
+        exp = parse(exp)
+    if isinstance(states, K.Structure):
+        return K.is_valid(exp, states, profile)
+    if results is not None:
+        keys = R.fingerprints(exp, states, model)
+        out = results.valid(*keys)
+        if out is None:
+            out = is_valid(exp, states, engine, cache, profile)
+            results.put_valid(*keys, out)
+        return out
+    if engine in ('fixpoint', 'symbolic', 'parallel'):
+        return all(test(exp, states, engine, cache, profile))
+    components = cache.components if cache is not None else S.Components()
+    return all(exp.check(i, cache, profile, components) for i in states)
+
+
+# Yields a Counterexample.Counterexample for each state where exp fails, as soon as it is found, so long
+#  runs can report the first problems early. Each has the failing state and, for path quantifiers, a play
+#  the other players can force: a finite path or a lasso, with the player making each move
+def violations(exp, states, engine='dfs', cache=None):
+    if type(exp) is str:
+        exp = parse(exp)
+    game, memo, ranks = None, {}, {}
+    if engine in ('fixpoint', 'symbolic', 'parallel'):
+        game = states if isinstance(states, G.Game) else G.compile(states)
+        labels = test(exp, game, engine, cache)[:len(states) if not isinstance(states, G.Game) else game.size]
+        for i, res in enumerate(labels):
+            if not res:
+                yield C.find(exp, game, i, memo, ranks)
+        return
+    components = cache.components if cache is not None else S.Components()
+    for i, state in enumerate(states):
+        if not exp.check(state, cache, None, components):
+            if game is None:  # the explanation comes from the fixpoint labels
+                game = G.compile(states)
+            yield C.find(exp, game, i, memo, ranks)
+
+
+def counterexample(exp, states, engine='dfs', cache=None):
+    # the first Counterexample, None if exp is valid
+    return next(violations(exp, states, engine, cache), None)
+
+
+if __name__ == '__main__':
+    # Below are the Train-Gate Problem examples from Bloisi's slides:
+    # *  The formulas can be accessed through TG.examples,
+    #    the text descriptions can be accessed through TG.descriptions,
+    #    and the state graph can be accessed through TG.states.
+    #
+    # *  The formulas can be evaluated by a certain property test (i.e., is_valid)
+    #    this can be achieved by using TG.print(f=<property_test>) which will evaluate
+    #    all formulas in the set against the system of states with the given property test.
+    #
+    # *  Formulas can be added through TG.add_example(e, t=None) where e is the text
+    #    representation of the formula and t is an option text description of the formula.
+    TG = TrainGate()
+    TG.print(f=test)
+    TG.print(f=is_valid)
+
+    # *  TG.print(f=<property_test>, profile=True) also shows where the time of each example went
+
+    # To create your own system and expressions you can create a new State graph
+    # in the same way as it is done earlier in this file.
+    # Use the Expression String Representation Syntax to create expressions and
+    # then use the parse function to get an Exp representation of the expression.
+    #
+    # *  Large suites of formulas can be checked in parallel with check_many(formulas, states, workers=N),
+    #    which returns the test results of every formula on a pool of N worker processes (default: one per
+    #    core); processes=False uses threads, which the GIL keeps to one core.
+    #
+    # *  Systems too large to build as States can be checked on the fly from an initial state with
+    #    Local.check(exp, initial, successors, labels, player), which only generates the states it needs.
+    #
+    # *  violations(exp, states) yields a counterexample for every state where exp fails, with the path the
+    #    other players can force; counterexample(exp, states) gives the first one.
+    #
+    # *  Fixpoint.strategies(exp, states) also returns the winning moves of the coalition of every {A}@, {A}[]
+    #    and {A} U subformula (a Strategy, strategy[state] is the next state), e.g. to deploy as a controller.
+    #
+    # *  Results can be kept between runs in a file: with results = Results.ResultCache('results.db'),
+    #    test(exp, states, results=results), is_valid(..., results=results) and TG.print(f, results=results)
+    #    only check what isn't stored for the same model and formula yet.
+    #
+    # *  A model that is edited between checks can be kept in an Incremental.Model(states): make the edits
+    #    through it (connect, disconnect, add_prop, remove_prop, add_state) and model.test(exp) only
+    #    recomputes the labels the edits can have changed.
+    #
+    # *  Products of several components are checked without listing their states on BDDs: build a
+    #    Symbolic.Model (Symbolic.train_gate(n) has n trains) and call Symbolic.is_valid(exp, model).
+    #
+    # *  One very large Game can use every core: with Parallel.Cluster(game) as cluster, cluster.label(exp)
+    #    splits the states between worker processes that share the compiled arrays.
+    #
+    # *  Games where every agent picks an action at the same time are Concurrent.Structures, e.g. from
+    #    Concurrent.build(agents, actions, delta, labels); test and is_valid take them in place of states.
@@ -0,0 +1,305 @@
+import bisect
+import sys
+
+# Reduced ordered binary decision diagrams, in pure Python. A node is an int: 0 and 1 are the terminals and
+#  every other node is a slot of the level, low and high lists (the variable tested, the node when it's 0
+#  and when it's 1). Variables are numbered by level, lower levels are tested first.
+#   unique      (level, low, high) -> node, so equal functions are the same int and equality is ==
+#   cache       the computed table, (op, operands...) -> node, cleared when it passes cache_limit entries
+#   refs        node -> external references, the roots kept by garbage collection
+#  Garbage collection is mark and sweep and only runs at checkpoints, where the caller names what it still
+#  holds (besides refs): the nodes nothing reaches go back to a free list and the computed table is dropped,
+#  so node numbers held anywhere else are no longer valid.
+#  The operations recurse once per level, so their depth is bounded by the number of variables
+
+FALSE = 0
+TRUE = 1
+LEAF = sys.maxsize  # level of the terminals, below every variable
+
+# computed table tags
+NOT = 0
+AND = 1
+OR = 2
+EXISTS = 3
+RELPROD = 4
+RENAME = 5
+
+
+class BDD:
+
+    def __init__(self, cache_limit=1 << 20, threshold=1 << 16):
+        self.level = [LEAF, LEAF]
+        self.low = [FALSE, TRUE]
+        self.high = [FALSE, TRUE]
+        self.unique = {}
+        self.cache = {}
+        self.refs = {}
+        self.free = []  # slots of collected nodes
+        self.vars = 0
+        self.cache_limit = cache_limit
+        self.threshold = threshold  # live nodes that make the next checkpoint collect
+        self.collections = 0
+        self.collected = 0  # nodes freed by all collections
+
+    def __repr__(self):
+        return repr(f'BDD | Vars: {self.vars} | Nodes: {len(self)} | Cached: {len(self.cache)}')
+
+    def __len__(self):
+        return len(self.unique)
+
+    def add_var(self):
+        # a new variable below the others, returns its level
+        self.vars += 1
+        return self.vars - 1
+
+    def mk(self, level, low, high):
+        if low == high:
+            return low
+        key = (level, low, high)
+        u = self.unique.get(key)
+        if u is None:
+            if self.free:
+                u = self.free.pop()
+                self.level[u], self.low[u], self.high[u] = level, low, high
+            else:
+                u = len(self.level)
+                self.level.append(level)
+                self.low.append(low)
+                self.high.append(high)
+            self.unique[key] = u
+        return u
+
+    def var(self, level):
+        return self.mk(level, FALSE, TRUE)
+
+    def cube(self, levels):
+        # conjunction of the variables at levels, the set quantified by exists and and_exists
+        u = TRUE
+        for level in sorted(levels, reverse=True):
+            u = self.mk(level, FALSE, u)
+        return u
+
+    def values(self, levels, keys):
+        # the assignments of the variables at levels (ascending) given as ints, the bit of levels[0] being the
+        #  most significant one; keys must be sorted and distinct
+        keys = list(keys)
+        width = len(levels)
+
+        def build(k, lo, hi):
+            if lo == hi:
+                return FALSE
+            if k == width:
+                return TRUE
+            shift = width - 1 - k
+            split = bisect.bisect_left(keys, (keys[lo] >> shift | 1) << shift, lo, hi)
+            return self.mk(levels[k], build(k + 1, lo, split), build(k + 1, split, hi))
+
+        return build(0, 0, len(keys))
+
+    # Operations
+
+    def neg(self, u):
+        if u <= TRUE:
+            return TRUE - u
+        key = (NOT, u)
+        out = self.cache.get(key)
+        if out is None:
+            out = self.cache[key] = self.mk(self.level[u], self.neg(self.low[u]), self.neg(self.high[u]))
+        return out
+
+    def conj(self, u, v):
+        if u == FALSE or v == FALSE:
+            return FALSE
+        if u == TRUE or u == v:
+            return v
+        if v == TRUE:
+            return u
+        if u > v:
+            u, v = v, u
+        key = (AND, u, v)
+        out = self.cache.get(key)
+        if out is None:
+            lu, lv = self.level[u], self.level[v]
+            if lu == lv:
+                out = self.mk(lu, self.conj(self.low[u], self.low[v]), self.conj(self.high[u], self.high[v]))
+            elif lu < lv:
+                out = self.mk(lu, self.conj(self.low[u], v), self.conj(self.high[u], v))
+            else:
+                out = self.mk(lv, self.conj(u, self.low[v]), self.conj(u, self.high[v]))
+            self.cache[key] = out
+        return out
+
+    def disj(self, u, v):
+        if u == TRUE or v == TRUE:
+            return TRUE
+        if u == FALSE or u == v:
+            return v
+        if v == FALSE:
+            return u
+        if u > v:
+            u, v = v, u
+        key = (OR, u, v)
+        out = self.cache.get(key)
+        if out is None:
+            lu, lv = self.level[u], self.level[v]
+            if lu == lv:
+                out = self.mk(lu, self.disj(self.low[u], self.low[v]), self.disj(self.high[u], self.high[v]))
+            elif lu < lv:
+                out = self.mk(lu, self.disj(self.low[u], v), self.disj(self.high[u], v))
+            else:
+                out = self.mk(lv, self.disj(u, self.low[v]), self.disj(u, self.high[v]))
+            self.cache[key] = out
+        return out
+
+    def exists(self, u, cube):
+        # u with the variables of cube (from cube()) quantified away
+        if u <= TRUE:
+            return u
+        level = self.level[u]
+        while self.level[cube] < level:
+            cube = self.high[cube]
+        if cube == TRUE:
+            return u
+        key = (EXISTS, u, cube)
+        out = self.cache.get(key)
+        if out is None:
+            if self.level[cube] == level:
+                rest = self.high[cube]
+                out = self.exists(self.low[u], rest)
+                if out != TRUE:
+                    out = self.disj(out, self.exists(self.high[u], rest))
+            else:
+                out = self.mk(level, self.exists(self.low[u], cube), self.exists(self.high[u], cube))
+            self.cache[key] = out
+        return out
+
+    def and_exists(self, u, v, cube):
+        # exists(conj(u, v), cube) without building the conjunction, the relational product
+        if u == FALSE or v == FALSE:
+            return FALSE
+        if u == TRUE or u == v:
+            return self.exists(v, cube)
+        if v == TRUE:
+            return self.exists(u, cube)
+        if u > v:
+            u, v = v, u
+        lu, lv = self.level[u], self.level[v]
+        level = min(lu, lv)
+        while self.level[cube] < level:
+            cube = self.high[cube]
+        if cube == TRUE:
+            return self.conj(u, v)
+        key = (RELPROD, u, v, cube)
+        out = self.cache.get(key)
+        if out is None:
+            u0, u1 = (self.low[u], self.high[u]) if lu == level else (u, u)
+            v0, v1 = (self.low[v], self.high[v]) if lv == level else (v, v)
+            if self.level[cube] == level:
+                rest = self.high[cube]
+                out = self.and_exists(u0, v0, rest)
+                if out != TRUE:
+                    out = self.disj(out, self.and_exists(u1, v1, rest))
+            else:
+                out = self.mk(level, self.and_exists(u0, v0, cube), self.and_exists(u1, v1, cube))
+            self.cache[key] = out
+        return out
+
+    def rename(self, u, shift):
+        # u with every variable moved shift levels, which must keep the variables of u in the same order
+        if u <= TRUE:
+            return u
+        key = (RENAME, u, shift)
+        out = self.cache.get(key)
+        if out is None:
+            out = self.cache[key] = self.mk(self.level[u] + shift, self.rename(self.low[u], shift),
+                                            self.rename(self.high[u], shift))
+        return out
+
+    # Queries
+
+    def evaluate(self, u, value):
+        # u under an assignment, value(level) is the value of a variable
+        while u > TRUE:
+            u = self.high[u] if value(self.level[u]) else self.low[u]
+        return u == TRUE
+
+    def count(self, u, levels):
+        # assignments of the variables at levels that satisfy u, which must not depend on any other
+        position = {level: k for k, level in enumerate(sorted(levels))}
+        position[LEAF] = len(levels)
+        memo = {FALSE: 0, TRUE: 1}
+
+        def below(u):  # over the variables from the level of u down
+            out = memo.get(u)
+            if out is None:
+                k = position[self.level[u]]
+                lo, hi = self.low[u], self.high[u]
+                out = memo[u] = (below(lo) << (position[self.level[lo]] - k - 1)) + \
+                    (below(hi) << (position[self.level[hi]] - k - 1))
+            return out
+
+        return below(u) << position[self.level[u]]
+
+    def assignments(self, u, levels):
+        # yields the assignments of the variables at levels that satisfy u as ints, like the keys of values
+        levels = sorted(levels)
+        width = len(levels)
+        stack = [(u, 0, 0)]
+        while stack:
+            u, k, key = stack.pop()
+            if u == FALSE:
+                continue
+            if k == width:
+                yield key
+                continue
+            if self.level[u] == levels[k]:
+                stack.append((self.high[u], k + 1, key << 1 | 1))
+                stack.append((self.low[u], k + 1, key << 1))
+            else:  # doesn't matter here
+                stack.append((u, k + 1, key << 1 | 1))
+                stack.append((u, k + 1, key << 1))
+
+    # Garbage collection
+
+    def ref(self, u):
+        self.refs[u] = self.refs.get(u, 0) + 1
+        return u
+
+    def deref(self, u):
+        count = self.refs[u] - 1
+        if count:
+            self.refs[u] = count
+        else:
+            del self.refs[u]
+
+    def checkpoint(self, roots=()):
+        # a point where the caller holds no node besides refs and roots: collects when there are more than
+        #  threshold nodes, and trims the computed table
+        if len(self.unique) > self.threshold:
+            self.collect(roots)
+        elif len(self.cache) > self.cache_limit:
+            self.cache.clear()
+
+    def collect(self, roots=()):
+        # frees every node not reachable from refs or roots, returns how many
+        marked = set()
+        stack = list(self.refs)
+        stack.extend(roots)
+        while stack:
+            u = stack.pop()
+            if u > TRUE and u not in marked:
+                marked.add(u)
+                stack.append(self.low[u])
+                stack.append(self.high[u])
+        dead = [key for key, u in self.unique.items() if u not in marked]
+        for key in dead:
+            self.free.append(self.unique.pop(key))
+        self.cache.clear()
+        self.collections += 1
+        self.collected += len(dead)
+        self.threshold = max(self.threshold, 2 * len(self.unique))
+        return len(dead)
+
+    def stats(self):
+        return {'vars': self.vars, 'nodes': len(self.unique), 'cached': len(self.cache),
+                'collections': self.collections, 'collected': self.collected}
@@ -0,0 +1,67 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import Expressions as E
+import Fixpoint as F
+import Game as G
+from util import parse
+
+# Batch checking of many formulas over one model. Exp.check keeps its search state off the State objects,
+#  so independent formula x state jobs can run side by side: on a process pool where every worker gets its
+#  own copy of the compiled model once, at start up, or on a thread pool sharing the model. The checks are
+#  pure Python, so the GIL runs threads one at a time: only processes use more than one core.
+#  The jobs of a pool share an EvalCache, so subformulas common to several formulas are checked once
+
+model = None  # the worker's copy of the model: (Game, its State objects, EvalCache)
+
+
+def start_worker(game):
+    global model
+    model = (game, game.build_states(), E.EvalCache())
+
+
+def run_dfs(job):
+    exp, i = job
+    return exp.check(model[1][i], model[2])
+
+
+def run_fixpoint(exp):
+    return F.label(exp, model[0])
+
+
+def check_many(formulas, states, workers=None, processes=True, engine='dfs'):
+    # returns out[f][s], whether formulas[f] holds in states[s]
+    #  workers is the pool size (default: number of cores, 1 checks in this thread), processes=False uses a
+    #  thread pool instead of a process pool, which saves copying the model to the workers but, held by the
+    #  GIL, runs on one core; engine is 'dfs' (Exp.check) or 'fixpoint' (Fixpoint.label)
+    formulas = [parse(f) if type(f) is str else f for f in formulas]
+    workers = workers or os.cpu_count() or 1
+    processes = processes and workers > 1
+    game = G.compile(states) if processes or engine == 'fixpoint' else None
+    n = len(states)
+    if engine == 'fixpoint':
+        jobs = formulas
+    else:
+        jobs = [(exp, i) for exp in formulas for i in range(n)]
+
+    if processes:
+        run = run_fixpoint if engine == 'fixpoint' else run_dfs
+        with ProcessPoolExecutor(workers, initializer=start_worker, initargs=(game,)) as pool:
+            results = list(pool.map(run, jobs, chunksize=max(1, len(jobs) // (4 * workers))))
+    else:
+        if engine == 'fixpoint':
+            def run(exp):
+                return F.label(exp, game)
+        else:
+            cache = E.EvalCache()
+
+            def run(job):
+                return job[0].check(states[job[1]], cache)
+        if workers > 1:
+            with ThreadPoolExecutor(workers) as pool:
+                results = list(pool.map(run, jobs))
+        else:
+            results = list(map(run, jobs))
+
+    if engine == 'fixpoint':
+        return [res[:n] for res in results]
+    return [results[k * n:(k + 1) * n] for k in range(len(formulas))]
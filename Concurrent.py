@@ -0,0 +1,243 @@
+import itertools
+import time
+from array import array
+import Expressions as E
+import Fixpoint as F
+import Game as G
+from util import parse
+
+# Concurrent game structures: in every state all agents pick one of their actions at the same time and the
+#  joint move decides the next state, instead of one player controlling each state. A Structure has
+#   agents          the names of the agents, in a fixed order
+#   actions[i]      the number of actions of every agent in state i, in that order
+#   table[i]        the successor of every joint move in state i, in mixed radix over the agents (the action
+#                   of the last agent varies fastest), so it has the product of actions[i] entries
+#   labels          proposition -> its states, like Game.build
+#  Pre_A(Z) holds in i if the agents in A have a joint move that leads into Z whatever the others do. An agent
+#  with 0 actions is stuck: if it is in A there is no such move, otherwise A's moves win by default (the
+#  turn-based deadlocks of Game). The path quantifiers are labeled like Fixpoint:
+#       {A}@ phi        =  Pre_A(phi)
+#       {A}[] phi       =  nu Z. phi ^ Pre_A(Z)
+#       {A} phi U psi   =  mu Z. psi V (phi ^ Pre_A(Z))
+#  ([] isn't the complement of the others' attractor here, one step of a concurrent game isn't determined).
+#  No step enumerates the joint moves as such: the table is grouped on the moves of the coalition, the offsets
+#  of the moves of the other agents are found once per state and added to the offset of each coalition move.
+#  Agents with 1 action don't count in either product.
+#   Pre_A           scans the moves of the others for each coalition move, stops at the first one that
+#                   leaves Z and at the first coalition move that doesn't
+#   [] and U        worklists over the states: a state is checked again (its Pre_A, with the same early
+#                   exits) only when one of its successors joined Z (U) or left it ([]), so nothing is
+#                   built per joint move or per coalition
+
+
+class Structure:
+
+    def __init__(self, agents, actions, table, labels=None):
+        self.agents = list(agents)
+        self.actions = [tuple(a) for a in actions]
+        self.table = [array('q', t) for t in table]
+        self.size = n = len(self.actions)
+        if len(self.table) != n:
+            raise ValueError(f'{len(self.table)} transition tables for {n} states')
+        for i, (counts, row) in enumerate(zip(self.actions, self.table)):
+            if len(counts) != len(self.agents):
+                raise ValueError(f'State {i} has actions for {len(counts)} of the {len(self.agents)} agents')
+            size = 1
+            for k in counts:
+                size *= k
+            if len(row) != size:
+                raise ValueError(f'State {i} has {size} joint moves but {len(row)} successors')
+            for j in row:
+                if not 0 <= j < n:
+                    raise ValueError(f'Move ({i}, {j}) is outside of the {n} states')
+        self.labels = {}
+        for p, members in (labels or {}).items():
+            row = self.labels[p] = bytearray(n)
+            for i in members:
+                row[i] = 1
+        self.sources = None  # the distinct predecessors of every state, made on first use
+
+    def __repr__(self):
+        return repr(f'Structure | States: {self.size} | Agents: {self.agents} | '
+                    f'Joint moves: {sum(map(len, self.table))} | Props: {list(self.labels)}')
+
+    def prop(self, name):
+        return bytearray(self.labels.get(name, G.empty(self.size)))
+
+    def coalition(self, players):
+        # the positions of the agents in players
+        return frozenset(a for a, name in enumerate(self.agents) if name in players)
+
+    def moves(self, i, ours):
+        # (offsets of the coalition's moves, offsets of the other agents' moves) in table[i], a joint move
+        #  is the sum of one of each; no coalition move if one of its agents is stuck, one that wins by
+        #  default (no moves of the others) if one of the others is
+        counts = self.actions[i]
+        stride = 1
+        bases, offsets = [0], [0]
+        for a in range(len(counts) - 1, -1, -1):
+            k = counts[a]
+            if k != 1:
+                if a in ours:
+                    bases = [b + m * stride for m in range(k) for b in bases]
+                else:
+                    offsets = [o + m * stride for m in range(k) for o in offsets]
+                stride *= k
+        return bases, offsets
+
+    def wins(self, i, z, ours):
+        # whether the agents in ours have a move in state i that leads into z whatever the others do
+        bases, offsets = self.moves(i, ours)
+        row = self.table[i]
+        for b in bases:
+            for o in offsets:
+                if not z[row[b + o]]:
+                    break
+            else:
+                return True
+        return False
+
+    def pre(self, z, ours):
+        # coalition predecessor of z for the agents in ours
+        return bytearray(self.wins(i, z, ours) for i in range(self.size))
+
+    def predecessors(self):
+        if self.sources is None:
+            self.sources = [[] for _ in range(self.size)]
+            for i, row in enumerate(self.table):
+                for j in set(row):
+                    self.sources[j].append(i)
+        return self.sources
+
+    def attractor(self, target, allowed, ours):
+        # least fixpoint of Z = target V (allowed ^ Pre_A(Z)), a state outside Z is checked again when one of
+        #  its successors joins
+        sources = self.predecessors()
+        z = bytearray(target)
+        queue = []
+        for i in range(self.size):
+            if not z[i] and allowed[i] and self.wins(i, z, ours):
+                z[i] = 1
+                queue.append(i)
+        queue.extend(i for i in range(self.size) if target[i])
+        while queue:
+            j = queue.pop()
+            for i in sources[j]:
+                if not z[i] and allowed[i] and self.wins(i, z, ours):
+                    z[i] = 1
+                    queue.append(i)
+        return z
+
+    def safe(self, phi, ours):
+        # greatest fixpoint of Z = phi ^ Pre_A(Z), a state in Z is checked again when one of its successors
+        #  leaves
+        sources = self.predecessors()
+        z = bytearray(phi)
+        queue = []
+        for i in range(self.size):
+            if z[i] and not self.wins(i, z, ours):
+                z[i] = 0
+                queue.append(i)
+        while queue:
+            j = queue.pop()
+            for i in sources[j]:
+                if z[i] and not self.wins(i, z, ours):
+                    z[i] = 0
+                    queue.append(i)
+        return z
+
+def build(agents, actions, delta, labels=None):
+    # Structure from a function: actions[i] maps the agents with other than 1 action in state i to their
+    #  number of actions, delta(i, joint) is the successor of the joint move (a tuple of action indices, one
+    #  per agent, in the order of agents)
+    agents = list(agents)
+    counts = [tuple(a.get(name, 1) for name in agents) for a in actions]
+    table = [[delta(i, joint) for joint in itertools.product(*map(range, c))] for i, c in enumerate(counts)]
+    return Structure(agents, counts, table, labels)
+
+
+def from_game(game):
+    # the turn-based Game as a Structure: the controller of a state has an action per successor and every
+    #  other agent only one; states without a controller get an agent None, which no coalition has
+    agents = list(game.players)
+    if any(k < 0 for k in game.owner):
+        agents.append(None)
+    counts, table = [], []
+    for i in range(game.size):
+        successors = game.successors(i)
+        c = [1] * len(agents)
+        c[game.owner[i]] = len(successors)  # owner -1 is the last one, None
+        counts.append(c)
+        table.append(successors)
+    return Structure(agents, counts, table, {p: [i for i, x in enumerate(game.prop(p)) if x] for p in game.props})
+
+
+def compute(exp, structure, memo):
+    # labels of exp from the labels of its children, which must already be in memo
+    n = structure.size
+    if type(exp.op) is int:
+        if exp.op == E.CONST:
+            return G.full(n) if exp.subexp1 else G.empty(n)
+        elif exp.op == E.PROP:
+            return structure.prop(exp.subexp1)
+        elif exp.op == E.NEG:
+            return G.neg(memo[exp.subexp1])
+        a, b = memo[exp.subexp1], memo[exp.subexp2]
+        if exp.op == E.DISJ:
+            return G.disj(a, b)
+        elif exp.op == E.IMPL:
+            return G.disj(G.neg(a), b)
+        else:  # exp.op == CONJ
+            return G.conj(a, b)
+    op, players = exp.op[E.OP], exp.op[E.PLAYERS]
+    ours = structure.coalition(players)
+    if op == E.CIRCLE:
+        return structure.pre(memo[exp.subexp1], ours)
+    elif op == E.SQUARE:
+        return structure.safe(memo[exp.subexp1], ours)
+    elif op == E.UNTIL:
+        return structure.attractor(memo[exp.subexp2], memo[exp.subexp1], ours)
+    elif op == E.AVOID or op == E.DIAMOND:  # same expansions as Exp.check
+        return memo[exp.expand()]
+    raise ValueError(f'Unknown operator: {exp.op}')
+
+
+def evaluate(exp, structure, memo, profile=None):
+    # labels every subformula of exp children first, on an explicit stack like Fixpoint.evaluate
+    stack = [exp]
+    while stack:
+        node = stack[-1]
+        if node in memo:
+            stack.pop()
+            continue
+        todo = [x for x in F.children(node) if x not in memo]
+        if todo:
+            stack.extend(todo)
+            continue
+        stack.pop()
+        if profile is None:
+            memo[node] = compute(node, structure, memo)
+        else:
+            start = time.perf_counter()
+            memo[node] = compute(node, structure, memo)
+            row = profile.row(node)
+            row[E.CALLS] += 1
+            row[E.SECONDS] += time.perf_counter() - start
+    return memo[exp]
+
+
+def label(exp, structure, profile=None):
+    # for each state of structure whether exp holds in it, exp is labeled in its normal form
+    if type(exp) is str:
+        exp = parse(exp)
+    if profile is not None:
+        profile.checks += 1
+        begin = time.perf_counter()
+    out = list(map(bool, evaluate(exp.normalize(), structure, {}, profile)))
+    if profile is not None:
+        profile.seconds += time.perf_counter() - begin
+    return out
+
+
+def is_valid(exp, structure, profile=None):
+    return all(label(exp, structure, profile))
@@ -0,0 +1,184 @@
+import Expressions as E
+import Fixpoint as F
+import Game as G
+
+# Counterexamples, built from the fixpoint labels of the formula on the compiled Game. Starting at the
+#  failing state, boolean connectives are followed down to an operand that decides the result there (the
+#  consequent of ->, a failing operand of ^ or V), and a ~ turns the search into one for a witness of the
+#  operand. Path formulas that fail are explained by a play the other players can force:
+#   {A}@ phi        one step to a successor where phi fails
+#   {A}[] phi       a finite path to a state where phi fails (or where the coalition is stuck), the other
+#                   players move along their attractor so every step gets closer
+#   {A} phi U psi   a finite path to a state where neither holds, or a lasso that never reaches psi
+#  At states of the coalition any move loses, the first one is taken. Path formulas that hold (under a ~)
+#  are explained by the play of the coalition's winning strategy (Fixpoint.strategies), where any move of
+#  the others is as good, the first one is taken:
+#   {A}@ phi        one step to a successor where phi holds
+#   {A}[] phi       a lasso that stays in phi (or a path to a state where the others are stuck)
+#   {A} phi U psi   a finite path through phi to psi, every step closer along the coalition's attractor
+#  When the path ends in a state where a subformula decides the result, that is explained in turn (cause)
+
+
+class Counterexample:
+
+    def __init__(self, exp, state, path, indices, players, props, loop=None, cause=None, holds=False):
+        self.exp = exp  # the formula that fails in state, or holds there with holds
+        self.holds = holds
+        self.state = state
+        self.path = path  # states from state on, each one the move of the player controlling the one before
+        self.indices = indices  # their positions in the model
+        self.players = players  # players[k] controls path[k]
+        self.props = props  # props[k] hold in path[k]
+        self.loop = loop  # the index in path the last state moves back to, None if the path is finite
+        self.cause = cause  # Counterexample of the subformula failing at the end of path, or None
+
+    def __repr__(self):
+        # one line per formula, states as #position{props}: {0}[](oog) fails: #0{oog} -(t)-> #3{ig}
+        #  (or holds: for the witness of a formula under a ~)
+        lines = []
+        item = self
+        while item is not None:
+            steps = []
+            for k, i in enumerate(item.indices):
+                if k:
+                    steps.append(f'-({item.players[k - 1]})->')
+                steps.append(f'#{i}{{{",".join(item.props[k])}}}')
+            if item.loop is not None:
+                steps.append(f'-({item.players[-1]})-> back to #{item.indices[item.loop]}')
+            lines.append(f'{item.exp} {"holds" if item.holds else "fails"}: ' + ' '.join(steps))
+            item = item.cause
+        return '\n'.join(lines)
+
+
+def find(exp, game, i, memo=None, ranks=None):
+    # Counterexample of exp in state i of game, which must be one where exp fails
+    #  memo holds the labels of the subformulas (Fixpoint.evaluate) and ranks the attractor orders the plays
+    #  follow, pass the same dicts for every state
+    memo = {} if memo is None else memo
+    ranks = {} if ranks is None else ranks
+    node = exp.normalize()
+    F.evaluate(node, game, memo)
+    if memo[node][i]:
+        raise ValueError(f'{exp} holds in state {i}')
+    top = last = None
+    holds = False  # whether node holds at i, the ~ on the way down flip it
+    while True:
+        # down the connectives to the formula that decides at i
+        while type(node.op) is int and node.op in (E.NEG, E.CONJ, E.DISJ, E.IMPL):
+            a, b = node.subexp1, node.subexp2
+            if node.op == E.NEG:
+                node, holds = a, not holds
+            elif node.op == E.IMPL:  # fails: b fails, holds: b holds or else a fails
+                if holds and not memo[b][i]:
+                    node, holds = a, False
+                else:
+                    node = b
+            elif (node.op == E.CONJ) != holds:  # a ^ that fails or a V that holds, one operand decides
+                node = a if memo[a][i] == holds else b
+            else:  # both decide, a path formula has more to show
+                node = b if type(a.op) is int and type(b.op) is not int else a
+        if holds:
+            path, loop, cause = witness(node, game, i, memo, ranks)
+        else:
+            path, loop, cause = explain(node, game, i, memo, ranks)
+        item = Counterexample(node, state(game, i), [state(game, j) for j in path], path,
+                              [owner(game, j) for j in path], [labels(game, j) for j in path], loop, None, holds)
+        if top is None:
+            top = item
+        else:
+            last.cause = item
+        last = item
+        if cause is None:
+            return top
+        node, i = cause, path[-1]
+
+
+def explain(node, game, i, memo, ranks):
+    # the play that refutes node at i: (path of state indices, loop, subformula failing at its end or None)
+    if type(node.op) is int:
+        return [i], None, None
+    kind, players = node.op[E.OP], node.op[E.PLAYERS]
+    if kind == E.CIRCLE:
+        sub = memo[node.subexp1]
+        for j in game.successors(i):
+            if not sub[j]:
+                return [i, j], None, node.subexp1
+        return [i], None, None  # the coalition controls i and has no move
+    if kind == E.SQUARE:
+        phi = memo[node.subexp1]
+        rank = ranks.get(node)  # the same for every state
+        if rank is None:
+            order = []
+            game.attractor(G.neg(phi), G.full(game.size), G.neg(game.coalition(players)), order)
+            rank = ranks[node] = {j: k for k, j in enumerate(order)}
+        path = [i]
+        while phi[path[-1]]:
+            nearest = [j for j in game.successors(path[-1]) if j in rank]
+            if not nearest:
+                return path, None, None  # stuck in a state of the coalition
+            path.append(min(nearest, key=rank.__getitem__))
+        return path, None, node.subexp1
+    # UNTIL, outside of the coalition's attractor to psi
+    z, phi = memo[node], memo[node.subexp1]
+    path, seen = [i], {i: 0}
+    while phi[path[-1]]:
+        nearest = [j for j in game.successors(path[-1]) if not z[j]]
+        if not nearest:
+            return path, None, None
+        if nearest[0] in seen:
+            return path, seen[nearest[0]], None  # psi fails all around the loop
+        seen[nearest[0]] = len(path)
+        path.append(nearest[0])
+    return path, None, node.subexp1
+
+
+def witness(node, game, i, memo, ranks):
+    # the play of the coalition's strategy that makes node hold at i: (path of state indices, loop,
+    #  subformula holding at its end or None)
+    if type(node.op) is int:
+        return [i], None, None
+    kind, players = node.op[E.OP], node.op[E.PLAYERS]
+    if kind == E.CIRCLE:
+        sub = memo[node.subexp1]
+        for j in game.successors(i):
+            if sub[j]:
+                return [i, j], None, node.subexp1
+        return [i], None, None  # the other players control i and have no move
+    z = memo[node]
+    if kind == E.SQUARE:  # stay in Z, the coalition has a move there and the others have nothing else
+        path, seen = [i], {i: 0}
+        while True:
+            nearest = [j for j in game.successors(path[-1]) if z[j]]
+            if not nearest:
+                return path, None, None  # stuck in a state of the other players
+            if nearest[0] in seen:
+                return path, seen[nearest[0]], None
+            seen[nearest[0]] = len(path)
+            path.append(nearest[0])
+    # UNTIL, down the coalition's attractor to psi: every state of Z joined after some (the coalition's) or
+    #  all (the others') of its successors
+    rank = ranks.get(node)
+    if rank is None:
+        order = []
+        game.attractor(memo[node.subexp2], memo[node.subexp1], game.coalition(players), order)
+        rank = ranks[node] = {j: k for k, j in enumerate(order)}
+    psi = memo[node.subexp2]
+    path = [i]
+    while not psi[path[-1]]:
+        nearest = [j for j in game.successors(path[-1]) if j in rank]
+        if not nearest:
+            return path, None, None  # stuck in a state of the other players
+        path.append(min(nearest, key=rank.__getitem__))
+    return path, None, node.subexp2
+
+
+def state(game, i):
+    return game.states[i] if game.states is not None else i
+
+
+def owner(game, i):
+    return game.players[game.owner[i]] if game.owner[i] >= 0 else None
+
+
+def labels(game, i):
+    return [p for k, p in enumerate(game.props) if game.labels[k] >> i & 1]
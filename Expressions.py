@@ -1,165 +1,684 @@
-from States import GREEN
-
-# v3: avoid and diamond
-
-# Operator constants
-CONST = -1
-PROP = 0
-NEG = 1
-DISJ = 2
-CONJ = 3
-IMPL = 4
-CIRCLE = 5
-SQUARE = 6
-UNTIL = 7
-AVOID = 8
-DIAMOND = 9
-
-# Index constants
-OP = 0
-PLAYERS = 1
-
-
-class Exp:
-    # assuming all operators are binary (can nest with parenthesis)
-    #  when op==CONST, PROP, NEG, CIRCLE, SQUARE only subexp1 has value
-    #  if op is combined path/temporal, then it's a 2-iterable of type and players (in the path quantifier)
-    def __init__(self, subexp1, subexp2=None, op=PROP):
-        self.subexp1 = subexp1
-        self.subexp2 = subexp2
-        self.op = op
-
-    def __repr__(self):
-        if type(self.op) is int:
-            if self.op is CONST:
-                return '{}'.format(self.subexp1)
-            elif self.op is PROP:
-                return '{}'.format(self.subexp1)
-            elif self.op is NEG:
-                return '~{}'.format(self.subexp1.__repr__())
-            elif self.op is DISJ:
-                return '({} V {})'.format(self.subexp1.__repr__(), self.subexp2.__repr__())
-            elif self.op is CONJ:
-                return '({} ^ {})'.format(self.subexp1.__repr__(), self.subexp2.__repr__())
-            elif self.op is IMPL:
-                return '({} -> {})'.format(self.subexp1.__repr__(), self.subexp2.__repr__())
-        elif self.op[OP] == CIRCLE:
-            s = f'({self.subexp1.__repr__()})' if self.subexp1.__repr__()[0] != '(' else self.subexp1.__repr__()
-            p = ','.join(self.op[PLAYERS])
-            return '{{{}}}@{}'.format(p if p else 0, s)
-        elif self.op[OP] == SQUARE:
-            s = f'({self.subexp1.__repr__()})' if self.subexp1.__repr__()[0] != '(' else self.subexp1.__repr__()
-            p = ','.join(self.op[PLAYERS])
-            return '{{{}}}[]{}'.format(p if p else 0, s)
-        elif self.op[OP] == UNTIL:
-            s1 = f'({self.subexp1.__repr__()})' if self.subexp1.__repr__()[0] != '(' else self.subexp1.__repr__()
-            s2 = f'({self.subexp2.__repr__()})' if self.subexp2.__repr__()[0] != '(' else self.subexp2.__repr__()
-            p = ','.join(self.op[PLAYERS])
-            return '{{{}}}{} U {}'.format(p if p else 0, s1, s2)
-        elif self.op[OP] == DIAMOND:
-            s = f'({self.subexp2.__repr__()})' if self.subexp2.__repr__()[0] != '(' else self.subexp2.__repr__()
-            p = ','.join(self.op[PLAYERS])
-            return '{{{}}}<>{}'.format(p if p else 0, s)
-        else:
-            return self.op
-
-    def __eq__(self, other):
-        if not isinstance(other, Exp):
-            return False
-        if self.op != other.op:
-            return False
-        if self.subexp1 != other.subexp1:
-            return False
-        if self.subexp2 != other.subexp2:
-            return False
-        return True
-
-    # This handles the vast majority of the computational model checking
-    def check(self, state):
-        if type(self.op) is int:  # that means that it's a simple predicate-order operator
-            if self.op == CONST:
-                return self.subexp1
-            elif self.op == PROP:
-                return self.subexp1 in state.props
-            elif self.op == NEG:
-                return not self.subexp1.check(state)
-            elif self.op == DISJ:
-                return self.subexp1.check(state) or self.subexp2.check(state)
-            elif self.op == IMPL:
-                return (not self.subexp1.check(state)) or self.subexp2.check(state)
-            else:  # self.op == CONJ:
-                return self.subexp1.check(state) and self.subexp2.check(state)
-
-        else:  # it's some path quantifier with players (NOTE: assuming each node has 1 player controlling it)
-            if self.op[OP] == CIRCLE:
-                # if the expression player isn't controlling, then check if every connection has subexp1
-                nearest = [self.subexp1.check(s) for s in state.connections]
-
-                if not (state.player in self.op[PLAYERS]):
-                    out = True
-                    for i in nearest:
-                        out = out and i
-                    return out
-
-                # check if any immediate connection has subexp1
-                out = False
-                for i in nearest:
-                    out = out or i
-                return out
-            elif self.op[OP] == SQUARE:
-                # if one of op[PLAYER] is in control, check if they *can* get subexp1 to be true somewhere
-                # else check if all options result in subexp1 to be true (other players can't stop subexp1)
-
-                if state.color == GREEN:
-                    return True
-                state.fill()
-
-                state_res = [self.check(i) for i in state.connections]  # Check if the pathing continues fine
-                imm_check = [self.subexp1.check(i) for i in
-                             state.connections]  # Check if the subexp is met in all neighboring states
-
-                # Check for if the controlling player *can* make the subexp true
-                out = False
-                if state.player in self.op[PLAYERS]:
-                    for i in range(len(state.connections)):
-                        out = out or (state_res[i] and imm_check[i])
-                    state.clear()
-                    return out
-                # Check if the other player(s) can make the subexp false (or, check if they can't avoid making it true)
-                else:
-                    out = True
-                    for i in range(len(state.connections)):
-                        out = out and (state_res[i] and imm_check[i])
-                    state.clear()
-                    return out
-
-            elif self.op[OP] == UNTIL:
-                # if subexp2 is true, then you're good
-                # if op[PLAYER] is in control, check if they *can* get subexp2 to be true following subexp1
-
-                if self.subexp2.check(state):
-                    return True  # found subexp2
-                elif state.color == GREEN:
-                    return False  # ran out of states without finding subexp2
-
-                state.fill()
-
-                state_res = [self.check(i) for i in state.connections]
-                if state.player in self.op[PLAYERS]:
-                    out = False
-                    for i in state_res:
-                        out = out or i
-                    state.clear()
-                    return out
-                else:
-                    out = True
-                    for i in state_res:
-                        out = out and i
-                    state.clear()
-                    return out
-
-            elif self.op[OP] == AVOID:  # assuming that avoid is avoiding existence of a path
-                return Exp(Exp(Exp(self.subexp1, op=NEG), op=(SQUARE, self.op[PLAYERS])), op=NEG).check(state)
-
-            elif self.op[OP] == DIAMOND:
-                return Exp(Exp(True, op=CONST), self.subexp1, UNTIL).check(state)
\ No newline at end of file
+import hashlib
+import time
+import weakref
+from States import prop_id, Components
+
+# v3: avoid and diamond
+
+# Operator constants
+CONST = -1
+PROP = 0
+NEG = 1
+DISJ = 2
+CONJ = 3
+IMPL = 4
+CIRCLE = 5
+SQUARE = 6
+UNTIL = 7
+AVOID = 8
+DIAMOND = 9
+
+NAMES = {CONST: 'CONST', PROP: 'PROP', NEG: 'NEG', DISJ: 'DISJ', CONJ: 'CONJ', IMPL: 'IMPL', CIRCLE: 'CIRCLE',
+         SQUARE: 'SQUARE', UNTIL: 'UNTIL', AVOID: 'AVOID', DIAMOND: 'DIAMOND'}
+
+# Index constants
+OP = 0
+PLAYERS = 1
+
+
+class Exp:
+    # assuming all operators are binary (can nest with parenthesis)
+    #  when op==CONST, PROP, NEG, CIRCLE, SQUARE only subexp1 has value
+    #  if op is combined path/temporal, then it's a 2-iterable of type and players (in the path quantifier)
+    # Nodes are hash-consed: constructing an Exp that is structurally equal to a live one returns that
+    #  node, so equal subformulas are shared (a DAG) and can be hashed by identity
+    interned = weakref.WeakValueDictionary()
+
+    def __new__(cls, subexp1, subexp2=None, op=PROP):
+        # structural key, children are interned already so they are identified by id
+        k = (op if type(op) is int else (op[OP], tuple(op[PLAYERS])),
+             id(subexp1) if isinstance(subexp1, Exp) else (type(subexp1), subexp1),
+             id(subexp2) if isinstance(subexp2, Exp) else (type(subexp2), subexp2))
+        node = Exp.interned.get(k)
+        if node is None:
+            node = super().__new__(cls)
+            Exp.interned[k] = node
+        return node
+
+    def __init__(self, subexp1, subexp2=None, op=PROP):
+        self.subexp1 = subexp1
+        self.subexp2 = subexp2
+        self.op = op
+
+    def __reduce__(self):  # unpickled nodes go through __new__ so they are interned in the new process too
+        return Exp, (self.subexp1, self.subexp2, self.op)
+
+    def __hash__(self):
+        return object.__hash__(self)
+
+    def lead(self):
+        # first character of repr(self), without building it
+        if type(self.op) is int:
+            if self.op is CONST or self.op is PROP:
+                return '{}'.format(self.subexp1)[:1]
+            return '~' if self.op is NEG else '('
+        return '{'
+
+    def parts(self):
+        # pieces of repr(self) in order: strings, and sub expressions still to be written out
+        def sub(x):
+            return x if isinstance(x, Exp) else x.__repr__()
+
+        def wrap(x):
+            first = x.lead() if isinstance(x, Exp) else x.__repr__()[0]
+            return [sub(x)] if first == '(' else ['(', sub(x), ')']
+
+        if type(self.op) is int:
+            if self.op is CONST:
+                return ['{}'.format(self.subexp1)]
+            elif self.op is PROP:
+                return ['{}'.format(self.subexp1)]
+            elif self.op is NEG:
+                return ['~', sub(self.subexp1)]
+            elif self.op is DISJ:
+                return ['(', sub(self.subexp1), ' V ', sub(self.subexp2), ')']
+            elif self.op is CONJ:
+                return ['(', sub(self.subexp1), ' ^ ', sub(self.subexp2), ')']
+            elif self.op is IMPL:
+                return ['(', sub(self.subexp1), ' -> ', sub(self.subexp2), ')']
+        elif self.op[OP] == CIRCLE:
+            p = ','.join(self.op[PLAYERS])
+            return ['{{{}}}@'.format(p if p else 0)] + wrap(self.subexp1)
+        elif self.op[OP] == SQUARE:
+            p = ','.join(self.op[PLAYERS])
+            return ['{{{}}}[]'.format(p if p else 0)] + wrap(self.subexp1)
+        elif self.op[OP] == UNTIL:
+            p = ','.join(self.op[PLAYERS])
+            return ['{{{}}}'.format(p if p else 0)] + wrap(self.subexp1) + [' U '] + wrap(self.subexp2)
+        elif self.op[OP] == DIAMOND:
+            p = ','.join(self.op[PLAYERS])
+            return ['{{{}}}<>'.format(p if p else 0)] + wrap(self.subexp2 if self.subexp2 is not None else self.subexp1)
+        return ['{}'.format(self.op)]
+
+    def __repr__(self):
+        # written out left to right from an explicit stack so deeply nested formulas don't hit the
+        #  recursion limit
+        out = []
+        stack = [self]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, Exp):
+                stack.extend(reversed(item.parts()))
+            else:
+                out.append(item)
+        return ''.join(out)
+
+    def __eq__(self, other):
+        # interned nodes are equal only if identical, the structural walk covers nodes built elsewhere
+        stack = [(self, other)]
+        while stack:
+            a, b = stack.pop()
+            if a is b:
+                continue
+            if not isinstance(a, Exp) or not isinstance(b, Exp):
+                if isinstance(a, Exp) or isinstance(b, Exp) or a != b:
+                    return False
+                continue
+            if a.op != b.op:
+                return False
+            stack.append((a.subexp2, b.subexp2))
+            stack.append((a.subexp1, b.subexp1))
+        return True
+
+    def expand(self):
+        # AVOID and DIAMOND are evaluated as the equivalent interned expression, None for other nodes
+        if type(self.op) is int:
+            return None
+        if self.op[OP] == AVOID:  # assuming that avoid is avoiding existence of a path
+            return Exp(Exp(Exp(self.subexp1, op=NEG), op=(SQUARE, self.op[PLAYERS])), op=NEG)
+        if self.op[OP] == DIAMOND:  # {A}<>exp == {A}true U exp
+            sub = self.subexp2 if self.subexp2 is not None else self.subexp1
+            return Exp(Exp(True, op=CONST), sub, op=(UNTIL, self.op[PLAYERS]))
+        return None
+
+    def name(self):
+        # operator name, e.g. 'SQUARE' for {A}[]
+        return NAMES[self.op if type(self.op) is int else self.op[OP]]
+
+    def normalize(self):
+        # equivalent formula in normal form, see normalize below
+        normal = self.__dict__.get('normal')
+        return normal if normal is not None else normalize(self)
+
+    def fingerprint(self):
+        # content hash of the normal form, the same in every process, e.g. to key results stored on disk
+        return self.normalize().rank[1].hex()
+
+    def compile(self):
+        # the Program of the normal form of this node, built once and kept on the (interned) node
+        program = self.__dict__.get('program')
+        if program is None:
+            program = self.program = Program(self.normalize())
+        return program
+
+    # This handles the vast majority of the computational model checking, see evaluate below
+    #  Results are memoized in cache when one is given, and counted in profile when one is given
+    #  components (States.Components) of the model are found once and kept in cache, or pass them in
+    #  limit bounds the results the search memoizes for itself, see evaluate
+    def check(self, state, cache=None, profile=None, components=None, limit=None):
+        return evaluate(self.compile(), state, cache, profile, components, limit)
+
+
+# Normal form, the rewrite pass between util.parse and evaluation. Every rule keeps the meaning of the formula
+#  in every state of every model:
+#   constants       ~true = false, true ^ x = x, false ^ x = false, x -> true = true, false -> x = true, ...
+#   negation        ~~x = x, x ^ ~x = false, x V ~x = true
+#   idempotence     x ^ x = x, x V x = x, x -> x = true
+#   temporal        {A}[] false = false, {A} x U true = true, {A} false U x = x
+#                   (not {A}[] true, {A}@ true or {A} x U false: in a deadlocked state the first two fail
+#                   when the coalition controls it and the last holds when it doesn't)
+#   expansion       AVOID and DIAMOND become their expansions
+#   order           the operands of ^ and V are sorted, smaller subformula first so it is tried first,
+#                   and coalitions are sorted
+#  Nodes are interned, so once the operands are in a canonical order, equal subformulas written differently
+#  (b ^ a and a ^ b, {t,c} and {c,t}, ~~a and a) are one node and evaluated once per state.
+#  rank orders the operands: the size of a subformula, then a digest of its structure that doesn't depend
+#  on the process, so the normal form is the same in every run (the digest is also Exp.fingerprint)
+
+
+def normalize(exp):
+    # normal form of exp, children first on an explicit stack. The result is kept on every node (normal) so
+    #  the subformulas shared with formulas normalized before are not looked at again
+    stack = [exp]
+    expanded = {}  # keeps the expansions alive until the node they stand for is done
+    while stack:
+        node = stack[-1]
+        if 'normal' in node.__dict__:
+            stack.pop()
+            continue
+        target = expanded.get(node) or node.expand()
+        if target is not None:
+            expanded[node] = target
+            if 'normal' not in target.__dict__:
+                stack.append(target)
+                continue
+            stack.pop()
+            node.normal = target.normal
+            continue
+        todo = [x for x in (node.subexp1, node.subexp2) if isinstance(x, Exp) and 'normal' not in x.__dict__]
+        if todo:
+            stack.extend(todo)
+            continue
+        stack.pop()
+        a = node.subexp1.normal if isinstance(node.subexp1, Exp) else node.subexp1
+        b = node.subexp2.normal if isinstance(node.subexp2, Exp) else node.subexp2
+        node.normal = simplify(node.op, a, b)
+    return exp.normal
+
+
+def simplify(op, a, b):
+    # one rewrite step, a and b are in normal form already
+    if type(op) is int:
+        if op == NEG:
+            if a.op == CONST:
+                return normal(Exp(not a.subexp1, op=CONST))
+            if a.op == NEG:
+                return a.subexp1
+        elif op == CONJ or op == DISJ:
+            unit = op == CONJ  # x ^ true = x, x V false = x
+            for x, y in ((a, b), (b, a)):
+                if x.op == CONST:
+                    return y if x.subexp1 == unit else x
+            if a is b:
+                return a
+            if a.op == NEG and a.subexp1 is b or b.op == NEG and b.subexp1 is a:
+                return normal(Exp(not unit, op=CONST))
+            if rank(b) < rank(a):
+                a, b = b, a
+        elif op == IMPL:
+            if a.op == CONST:
+                return b if a.subexp1 else normal(Exp(True, op=CONST))
+            if b.op == CONST:
+                return b if b.subexp1 else simplify(NEG, a, None)
+            if a is b:
+                return normal(Exp(True, op=CONST))
+        return normal(Exp(a, b, op))
+    kind = op[OP]
+    if kind == SQUARE and a.op == CONST and not a.subexp1:
+        return a
+    if kind == UNTIL:
+        if b.op == CONST and b.subexp1:
+            return b
+        if a.op == CONST and not a.subexp1:
+            return b
+    return normal(Exp(a, b, op=(kind, sorted(set(op[PLAYERS]), key=str))))
+
+
+def normal(node):
+    # marks a node built from normal operands as normal, with its rank
+    if 'normal' not in node.__dict__:
+        op = node.op if type(node.op) is int else (node.op[OP], tuple(node.op[PLAYERS]))
+        parts = [repr(op)]
+        size = 1
+        for x in (node.subexp1, node.subexp2):
+            if isinstance(x, Exp):
+                size += x.rank[0]
+                parts.append(x.rank[1].hex())
+            else:
+                parts.append(repr(x))
+        node.rank = (size, hashlib.blake2b('|'.join(parts).encode(), digest_size=16).digest())
+        node.normal = node
+    return node
+
+
+def rank(node):
+    return node.rank
+
+
+class Program:
+    # An Exp lowered to a flat list of instructions in postfix order, children before their parents and
+    #  shared subformulas once, so evaluate dispatches on one small int per step instead of on the type and
+    #  shape of op. Instruction i is
+    #   code[i]     CONST, PROP, NEG, DISJ, CONJ, IMPL, CIRCLE, SQUARE or UNTIL (AVOID and DIAMOND are
+    #               lowered to their expansion)
+    #   arg1[i]     the constant, the bit of the proposition in State.mask (the name is interned here, so
+    #               states made after the program, e.g. during a search, get the same bit), or the first operand
+    #   arg2[i]     the second operand of DISJ, CONJ, IMPL and UNTIL
+    #   players[i]  frozenset of the coalition of CIRCLE, SQUARE and UNTIL
+    #   nodes[i]    the Exp it came from, for EvalCache and Profile
+    #  Operands are instruction indices and the last instruction is the root
+    def __init__(self, exp):
+        self.code, self.arg1, self.arg2, self.players, self.nodes = [], [], [], [], []
+        at = {}  # node -> instruction
+        stack = [exp]
+        while stack:
+            node = stack[-1]
+            if node in at:
+                stack.pop()
+                continue
+            target = node.expand()
+            if target is not None:
+                if target not in at:
+                    stack.append(target)
+                    continue
+                stack.pop()
+                at[node] = at[target]
+                continue
+            todo = [x for x in (node.subexp1, node.subexp2) if isinstance(x, Exp) and x not in at]
+            if todo:
+                stack.extend(todo)
+                continue
+            stack.pop()
+            at[node] = len(self.code)
+            op = node.op
+            kind = op if type(op) is int else op[OP]
+            self.code.append(kind)
+            self.nodes.append(node)
+            self.players.append(None if type(op) is int else frozenset(op[PLAYERS]))
+            if kind == CONST:
+                self.arg1.append(node.subexp1)
+            elif kind == PROP:
+                self.arg1.append(prop_id(node.subexp1))
+            else:
+                self.arg1.append(at[node.subexp1])
+            self.arg2.append(at[node.subexp2] if isinstance(node.subexp2, Exp) else None)
+        self.root = at[exp]
+
+    def __len__(self):
+        return len(self.code)
+
+    def check(self, state, cache=None, profile=None, components=None, limit=None):
+        return evaluate(self, state, cache, profile, components, limit)
+
+
+# Frame layout of the evaluation work-stack
+NODE = 0
+STATE = 1
+STEP = 2
+NEXT = 3
+PATH = 4
+FRESH = 5
+SUCC = 6
+
+
+def evaluate(program, state, cache=None, profile=None, components=None, limit=None):
+    # Depth-first search of Exp.check on an explicit work-stack instead of the Python call stack, so long
+    #  paths and deeply nested formulas don't hit the recursion limit. Each frame is one pending check
+    #  [instruction, state, step, next successor, path, fresh, successors], a child check is a new frame on
+    #  top of it and its result is handed back through ret. A frame asks state.connections once and keeps the
+    #  list, so states that generate their successors (Local.Node) do it once per frame.
+    # The results are the fixpoint ones (Fixpoint.label): {A}[] phi needs phi in the state itself too, and
+    #  {A} phi U psi needs phi in every state before psi. The recursive check before this one looked at phi
+    #  from the successors on for [], not at all for U, and shared its path marks between nested searches;
+    #  tests/test_expressions.py pins the results that changed
+    # [] and U follow a path through the model; the states on it are kept in a set owned by that search
+    #  (path), never on the State objects, so any number of checks can run on one model at once. A frame
+    #  is fresh when it starts a new search; its result doesn't depend on any path and can be memoized.
+    #  Results that hold whatever the path (a [] that fails, a U that succeeds) are memoized too
+    # With the strongly connected components of the model, a search stepping into another component starts
+    #  a fresh one: no state of its path can be reached from there, so the result is the same and it is
+    #  memoized. The search runs component by component, downstream ones first, each one solved once per
+    #  node; only inside a component with cycles the result depends on the path. On an acyclic model every
+    #  (node, state) is evaluated once
+    # With limit, only the limit latest memoized results are kept, so the states the search is done with can
+    #  be freed; what it holds then is those, the path of the current search and the frames on the stack
+    if isinstance(program, Exp):
+        program = program.compile()
+    code, arg1, arg2, players, nodes = program.code, program.arg1, program.arg2, program.players, program.nodes
+    known = {}  # (instruction, state) -> result, only for results that don't depend on the search path
+    root = program.root
+    if components is None and cache is not None:
+        components = cache.components
+    number = None
+    if components is not None:
+        components.of(state)  # numbers every state the search can reach
+        number = components.number
+    if profile is not None:
+        profile.checks += 1
+        begin = time.perf_counter()
+    if cache is not None:
+        out = cache.get(nodes[root], state)
+        if out is not None:
+            if profile is not None:
+                profile.hit(nodes[root])
+                profile.seconds += time.perf_counter() - begin
+            return out
+    stack = [[root, state, 0, 0, None, True, None]]
+    ret = None
+    while stack:
+        if profile is not None:
+            start = time.perf_counter()
+        frame = stack[-1]
+        pc, state, step = frame[NODE], frame[STATE], frame[STEP]
+        op = code[pc]
+        out = None  # set when the frame is finished
+        child = None  # set when the frame needs a sub result first
+        child_state = state
+        child_path = None  # continuing this search, or None to start a fresh check
+        resume = step + 1  # step to continue at once child is done
+
+        if op == PROP:
+            out = (state.mask >> arg1[pc]) & 1 == 1  # same as state.has
+        elif op == CONJ or op == DISJ or op == IMPL:
+            if step == 0:
+                child = arg1[pc]
+            elif step == 1:  # short circuit on subexp1
+                if op == CONJ:
+                    out = False if not ret else None
+                elif op == DISJ:
+                    out = True if ret else None
+                else:  # op == IMPL
+                    out = True if not ret else None
+                if out is None:
+                    child = arg2[pc]
+            else:
+                out = ret
+        elif op == NEG:
+            if step == 0:
+                child = arg1[pc]
+            else:
+                out = not ret
+        elif op == CONST:
+            out = arg1[pc]
+
+        else:  # it's some path quantifier with players (NOTE: assuming each node has 1 player controlling it,
+            #  see Concurrent for games where all agents move at once)
+            exists = state.player in players[pc]  # the controlling player is on our side
+            nearest = frame[SUCC]
+            if nearest is None:
+                nearest = frame[SUCC] = state.connections or ()
+            path = frame[PATH]
+            if op == CIRCLE:
+                # the controlling player needs one connection with subexp1, otherwise every connection needs it
+                if step and ret == exists:
+                    out = exists
+                elif frame[NEXT] < len(nearest):
+                    child, child_state = arg1[pc], nearest[frame[NEXT]]
+                    frame[NEXT] += 1
+                else:
+                    out = not exists
+
+            elif op == SQUARE:
+                # subexp1 has to hold here, and if one of op[PLAYER] is in control they *can* keep it true from
+                # some connection on, else it has to stay true from every connection (other players can't stop it)
+                # step 1 returns from subexp1 here, step 2 from the path continuing at a connection
+                if path is None:
+                    frame[PATH] = path = set()
+                res = None  # result of the last connection
+                if step == 0:
+                    if state in path:
+                        out = True  # closed a cycle along which subexp1 holds
+                    else:
+                        child = arg1[pc]
+                elif step == 1:
+                    if not ret:
+                        out = False
+                    else:
+                        path.add(state)
+                else:
+                    res = ret
+                if out is None and child is None:
+                    if res is not None and res == exists:
+                        out = exists
+                    elif frame[NEXT] < len(nearest):
+                        child, child_state, child_path = pc, nearest[frame[NEXT]], path
+                        frame[NEXT] += 1
+                        resume = 2
+                    else:
+                        out = not exists
+                    if out is not None:
+                        path.discard(state)
+
+            else:  # op == UNTIL
+                # if subexp2 is true, then you're good
+                # else subexp1 has to hold here, and if op[PLAYER] is in control they *can* get to subexp2 from
+                # some connection, else subexp2 has to be reached from every connection
+                # step 1 returns from subexp2 here, step 2 from subexp1 here, step 3 from a connection
+                if path is None:
+                    frame[PATH] = path = set()
+                res = None
+                if step == 0:
+                    child = arg2[pc]
+                elif step == 1:
+                    if ret:
+                        out = True  # found subexp2
+                    elif state in path:
+                        out = False  # went around a cycle without finding subexp2
+                    else:
+                        child = arg1[pc]
+                elif step == 2:
+                    if not ret:
+                        out = False
+                    else:
+                        path.add(state)
+                else:
+                    res = ret
+                if out is None and child is None:
+                    if res is not None and res == exists:
+                        out = exists
+                    elif frame[NEXT] < len(nearest):
+                        child, child_state, child_path = pc, nearest[frame[NEXT]], path
+                        frame[NEXT] += 1
+                        resume = 3
+                    else:
+                        out = not exists
+                    if out is not None:
+                        path.discard(state)
+
+        if child is not None:
+            frame[STEP] = resume
+            if child_path is not None and number is not None and number[child_state] != number[state]:
+                child_path = None  # stepped into another component, see above
+            ret = known.get((child, child_state))
+            if ret is None and child_path is None and cache is not None:
+                ret = cache.get(nodes[child], child_state)
+            if ret is None:
+                stack.append([child, child_state, 0, 0, child_path, child_path is None, None])
+            if profile is not None:
+                profile.step(nodes[pc], state, step, child_state is not state, start)
+                if ret is not None:
+                    profile.hit(nodes[child])
+            continue
+        stack.pop()
+        if frame[FRESH] or op == SQUARE and out is False or op == UNTIL and out is True:
+            known[(pc, state)] = out
+            if limit is not None and len(known) > limit:
+                del known[next(iter(known))]  # the oldest one
+            if cache is not None:
+                cache.put(nodes[pc], state, out)
+        if profile is not None:
+            profile.step(nodes[pc], state, step, False, start)
+        ret = out
+    if profile is not None:
+        profile.seconds += time.perf_counter() - begin
+    return ret
+
+
+class EvalCache:
+    # Memo table of Exp.check results keyed by (node, state), shared across all the formulas of a batch
+    #  so interned subformulas are evaluated once per state. Entries must be invalidated by the caller
+    #  when the model or a node changes, see invalidate
+    def __init__(self):
+        self.table = {}  # node -> {state: result}
+        self.components = Components()  # of the model, for Exp.check
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return sum(len(row) for row in self.table.values())
+
+    def get(self, node, state):
+        row = self.table.get(node)
+        if row is not None and state in row:
+            self.hits += 1
+            return row[state]
+        self.misses += 1
+        return None
+
+    def put(self, node, state, result):
+        self.table.setdefault(node, {})[state] = result
+
+    def get_all(self, node, states):
+        # results of node for every state, or None unless all of them are known
+        row = self.table.get(node)
+        if row is None or any(s not in row for s in states):
+            self.misses += len(states)
+            return None
+        self.hits += len(states)
+        return [row[s] for s in states]
+
+    def put_all(self, node, states, results):
+        self.table.setdefault(node, {}).update(zip(states, results))
+
+    def invalidate(self, state=None, node=None):
+        # drops the entries of node, everything when neither is given, and with state the entries of every
+        #  state that reaches it: results of @, [] and U look ahead, so a change to the props or connections
+        #  of state changes them at its predecessors too. The components go unless only node is given, they
+        #  may have changed with the model
+        if node is None:
+            self.components.clear()
+        rows = self.table.values() if node is None else [self.table.get(node, {})]
+        if state is not None:
+            cone = self.cone(state)
+            for row in rows:
+                for s in cone:
+                    row.pop(s, None)
+        elif node is not None:
+            self.table.pop(node, None)
+        else:
+            self.table.clear()
+
+    def cone(self, state):
+        # state and the cached states it can be reached from, over the connections they have now
+        #  (the ones state had before the change don't matter, nothing reaches anything through them)
+        predecessors = {}
+        seen = set()
+        stack = [s for row in self.table.values() for s in row if s not in seen and not seen.add(s)]
+        while stack:
+            s = stack.pop()
+            for t in s.connections or ():
+                predecessors.setdefault(t, []).append(s)
+                if t not in seen:
+                    seen.add(t)
+                    stack.append(t)
+        out = {state}
+        stack = [state]
+        while stack:
+            for s in predecessors.get(stack.pop(), ()):
+                if s not in out:
+                    out.add(s)
+                    stack.append(s)
+        return out
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self)}
+
+# Row layout of Profile.nodes
+CALLS = 0
+STATES = 1
+ITERATIONS = 2
+HITS = 3
+SECONDS = 4
+
+
+class Profile:
+    # Opt-in instrumentation, passed to Exp.check, Fixpoint.label, ATL.test or ATL.is_valid like an EvalCache.
+    #  For each Exp node it counts
+    #   calls       evaluations of the node: dfs frames started, or 1 per fixpoint labeling
+    #   states      distinct states it was evaluated in (State objects for dfs, indices for fixpoint)
+    #   iterations  successors followed: steps of a search along the model for dfs, worklist pops for fixpoint,
+    #               rounds until the fixpoint for symbolic, rounds of messages between the workers for parallel
+    #   hits        results reused from the memo tables instead of being evaluated
+    #   seconds     time spent on the node itself, children excluded
+    #  Without a profile the engines only test for None, so the counts cost nothing when they are off
+    def __init__(self):
+        self.nodes = {}  # node -> [calls, states, iterations, hits, seconds]
+        self.checks = 0  # top level checks (dfs) or labelings (fixpoint)
+        self.seconds = 0.0  # wall time of those
+
+    def row(self, node):
+        row = self.nodes.get(node)
+        if row is None:
+            row = self.nodes[node] = [0, set(), 0, 0, 0.0]
+        return row
+
+    def step(self, node, state, step, successor, start):
+        # one turn of the dfs work-stack on a frame of node, which began at start
+        row = self.row(node)
+        if step == 0:
+            row[CALLS] += 1
+            row[STATES].add(state)
+        if successor:
+            row[ITERATIONS] += 1
+        row[SECONDS] += time.perf_counter() - start
+
+    def hit(self, node):
+        self.row(node)[HITS] += 1
+
+    def report(self):
+        # {'checks', 'seconds', 'nodes': per node, slowest first, 'ops': totals per operator name}
+        nodes, ops = [], {}
+        for node, (calls, states, iterations, hits, seconds) in self.nodes.items():
+            name = node.name()
+            nodes.append({'node': repr(node), 'op': name, 'calls': calls, 'states': len(states),
+                          'iterations': iterations, 'hits': hits, 'seconds': seconds})
+            total = ops.setdefault(name, {'nodes': 0, 'calls': 0, 'states': 0, 'iterations': 0, 'hits': 0,
+                                          'seconds': 0.0})
+            total['nodes'] += 1
+            total['calls'] += calls
+            total['states'] += len(states)
+            total['iterations'] += iterations
+            total['hits'] += hits
+            total['seconds'] += seconds
+        nodes.sort(key=lambda x: x['seconds'], reverse=True)
+        return {'checks': self.checks, 'seconds': self.seconds, 'nodes': nodes, 'ops': ops}
+
+    def __str__(self):
+        # the report as a table per operator
+        report = self.report()
+        lines = [f'{report["checks"]} checks in {report["seconds"] * 1000:.3f} ms',
+                 f'{"op":<8}{"nodes":>7}{"calls":>9}{"states":>8}{"iters":>9}{"hits":>7}{"ms":>10}']
+        for name, t in sorted(report['ops'].items(), key=lambda x: x[1]['seconds'], reverse=True):
+            lines.append(f'{name:<8}{t["nodes"]:>7}{t["calls"]:>9}{t["states"]:>8}{t["iterations"]:>9}'
+                         f'{t["hits"]:>7}{t["seconds"] * 1000:>10.3f}')
+        return '\n'.join(lines)
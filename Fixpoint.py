@@ -0,0 +1,166 @@
+import time
+from array import array
+import Expressions as E
+import Game as G
+
+# Bottom-up labeling engine: instead of searching from every start state like Exp.check,
+#  each subformula is labeled with the set of states where it holds, children first.
+#  Path quantifiers are solved with the coalition-predecessor Pre_A and fixpoints:
+#       {A}@ phi        =  Pre_A(phi)
+#       {A}[] phi       =  nu Z. phi ^ Pre_A(Z)
+#       {A} phi U psi   =  mu Z. psi V (phi ^ Pre_A(Z))
+#  where Pre_A(Z) holds in a state if a player in A controls it and some successor is in Z,
+#  or if another player controls it and every successor is in Z
+#  (NOTE: same assumption as Exp.check, each state has exactly 1 controlling player;
+#  Concurrent labels games where all agents move at once)
+# Every fixpoint is computed by a backward worklist over the predecessor edges of the compiled
+#  Game, so a full model check costs O(|formula| * |edges|)
+
+
+def children(exp):
+    expansion = exp.expand()
+    if expansion is not None:
+        return [expansion]
+    return [x for x in (exp.subexp1, exp.subexp2) if isinstance(x, E.Exp)]
+
+
+def compute(exp, game, memo, strategies=None):
+    # labels of exp from the labels of its children, which must already be in memo
+    #  with strategies (a dict), the Strategy of a {A}@, {A}[] or {A} U node is put in it as well
+    n = game.size
+    if type(exp.op) is int:
+        if exp.op == E.CONST:
+            return G.full(n) if exp.subexp1 else G.empty(n)
+        elif exp.op == E.PROP:
+            return game.prop(exp.subexp1)
+        elif exp.op == E.NEG:
+            return G.neg(memo[exp.subexp1])
+        a, b = memo[exp.subexp1], memo[exp.subexp2]
+        if exp.op == E.DISJ:
+            return G.disj(a, b)
+        elif exp.op == E.IMPL:
+            return G.disj(G.neg(a), b)
+        else:  # exp.op == CONJ
+            return G.conj(a, b)
+    op, players = exp.op[E.OP], exp.op[E.PLAYERS]
+    moves = None if strategies is None else array('q', [-1]) * n
+    if op == E.CIRCLE:
+        out = game.pre(memo[exp.subexp1], game.coalition(players), moves)
+    elif op == E.SQUARE:
+        # the states where the opposing players can force ~phi are exactly the ones where A can't keep phi
+        out = G.neg(game.attractor(G.neg(memo[exp.subexp1]), G.full(n), G.neg(game.coalition(players))))
+        if moves is not None:  # stay out of the opponents' attractor, every state of A there can
+            ours = game.coalition(players)
+            for i in range(n):
+                if ours[i] and out[i]:
+                    moves[i] = next(j for j in game.successors(i) if out[j])
+    elif op == E.UNTIL:
+        out = game.attractor(memo[exp.subexp2], memo[exp.subexp1], game.coalition(players), choice=moves)
+    elif op == E.AVOID or op == E.DIAMOND:  # same expansions as Exp.check
+        return memo[exp.expand()]
+    else:
+        raise ValueError(f'Unknown operator: {exp.op}')
+    if moves is not None:
+        strategies[exp] = Strategy(exp, moves, game)
+    return out
+
+
+
+def evaluate(exp, game, memo, cache=None, profile=None, strategies=None):
+    # labels every subformula of exp children first, on an explicit stack so formula depth is unbounded
+    #  with a profile, the iterations of [] and U are the states their worklist took in
+    #  (strategies are only made for the nodes labeled here, so they don't go with a cache)
+    cached = cache is not None and game.states is not None and strategies is None
+    stack = [exp]
+    looked_up = set()
+    while stack:
+        node = stack[-1]
+        if node in memo:
+            stack.pop()
+            continue
+        if cached and node not in looked_up:
+            looked_up.add(node)
+            known = cache.get_all(node, game.states)
+            if known is not None:
+                memo[node] = bytearray(known)
+                stack.pop()
+                if profile is not None:
+                    profile.hit(node)
+                continue
+        todo = [x for x in children(node) if x not in memo]
+        if todo:
+            stack.extend(todo)
+            continue
+        stack.pop()
+        if profile is None:
+            memo[node] = compute(node, game, memo, strategies)
+        else:
+            start = time.perf_counter()
+            memo[node] = compute(node, game, memo, strategies)
+            row = profile.row(node)
+            row[E.CALLS] += 1
+            row[E.STATES].update(range(game.size))
+            if type(node.op) is not int and node.op[E.OP] in (E.CIRCLE, E.SQUARE, E.UNTIL):
+                # a state goes through the worklist once it joins the attractor ([] works on the complement)
+                row[E.ITERATIONS] += game.size if node.op[E.OP] == E.CIRCLE else \
+                    memo[node].count(0 if node.op[E.OP] == E.SQUARE else 1)
+            row[E.SECONDS] += time.perf_counter() - start
+        if cached:
+            cache.put_all(node, game.states, map(bool, memo[node]))
+    return memo[exp]
+
+
+def label(exp, model, cache=None, profile=None):
+    # returns for each state whether exp holds in it, model is a compiled Game or a list of States
+    #  exp is labeled in its normal form (Exp.normalize), an Expressions.EvalCache shares the labels of
+    #  interned subformulas between calls, an Expressions.Profile collects statistics of the labeling
+    if profile is not None:
+        profile.checks += 1
+        begin = time.perf_counter()
+    exp = exp.normalize()
+    if isinstance(model, G.Game):
+        out = list(map(bool, evaluate(exp, model, {}, cache, profile)))
+    else:
+        out = list(map(bool, evaluate(exp, G.compile(model), {}, cache, profile)[:len(model)]))
+    if profile is not None:
+        profile.seconds += time.perf_counter() - begin
+    return out
+
+
+class Strategy:
+    # Memoryless strategy of the coalition of a {A}@, {A}[] or {A} U formula, made while it was labeled:
+    #  moves[i] is the index of the successor state i moves to, -1 where the coalition doesn't control i,
+    #  the formula doesn't hold there or nothing is left to do (psi holds already, for U)
+    #  Following it the formula holds whatever the other players do: the next state has phi for @, the play
+    #  stays in phi for [], and reaches psi through phi for U
+    def __init__(self, exp, moves, game):
+        self.exp = exp
+        self.moves = moves  # array('q')
+        self.game = game
+        self.index = None  # State -> index, made on first use
+
+    def __repr__(self):
+        return repr(f'Strategy | Formula: {self.exp} | Moves: {len(self)} of {self.game.size} states')
+
+    def __len__(self):
+        return sum(1 for j in self.moves if j >= 0)
+
+    def __getitem__(self, state):
+        # the move in state, a State of the game (the next State, None if there is no move) or an index
+        if isinstance(state, int):
+            return self.moves[state]
+        if self.index is None:
+            self.index = {s: i for i, s in enumerate(self.game.states)}
+        j = self.moves[self.index[state]]
+        return self.game.states[j] if j >= 0 else None
+
+
+def strategies(exp, model):
+    # labels exp like label and returns (labels, {node: Strategy}) for every {A}@, {A}[] and {A} U
+    #  subformula of its normal form; the indices are those of model, or of Game.compile(model) for a list
+    #  of States (the given states first)
+    game = model if isinstance(model, G.Game) else G.compile(model)
+    out = {}
+    labels = evaluate(exp.normalize(), game, {}, strategies=out)
+    n = game.size if isinstance(model, G.Game) else len(model)
+    return list(map(bool, labels[:n])), out
@@ -0,0 +1,308 @@
+import hashlib
+import operator
+import sys
+from array import array
+import States as S
+
+# Compiled game structure: a State graph flattened into integer-indexed arrays
+#   offsets, targets    successors of state i are targets[offsets[i]:offsets[i+1]] (CSR)
+#   roffsets, sources   predecessors of state i, same layout over the reversed edges
+#   owner               owner[i] is the index in players of the player controlling state i, -1 if none
+#   labels              bit matrix of propositions, bit i of labels[p] is set when state i has props[p]
+# State sets are bytearrays holding one 0/1 byte per state, so boolean connectives run as
+#  single big-int operations, and so does the coalition-predecessor over a bit row of the edges (layout)
+
+FLIP = bytes.maketrans(b'\x00\x01', b'\x01\x00')
+BITS = bytes.maketrans(b'01', b'\x00\x01')
+CHARS = bytes.maketrans(b'\x00\x01', b'01')
+GUARDS = bytes.maketrans(b'\x00\x01\x02', b'\x01\x00\x00')  # the marks of Game.layout to its guard bits
+OTHERS = bytes.maketrans(b'\x01', b'\x02')  # and to the byte 2 at every other position
+
+
+def empty(n):
+    return bytearray(n)
+
+
+def full(n):
+    return bytearray(b'\x01' * n)
+
+
+def neg(a):
+    return bytearray(a.translate(FLIP))
+
+
+def conj(a, b):
+    return bytearray((int.from_bytes(a, 'little') & int.from_bytes(b, 'little')).to_bytes(len(a), 'little'))
+
+
+def disj(a, b):
+    return bytearray((int.from_bytes(a, 'little') | int.from_bytes(b, 'little')).to_bytes(len(a), 'little'))
+
+
+def unpack(bits, n):
+    # bit-packed row of the proposition matrix to a state set
+    return bytearray(format(bits, f'0{n}b')[::-1].encode().translate(BITS)) if n else bytearray()
+
+
+def pack(a):
+    # state set to a bit-packed row of the proposition matrix
+    return int(a.translate(CHARS)[::-1], 2) if a else 0
+
+
+def guards(row, width, others):
+    # the guard bits of a bit row of Game.layout, as a state set
+    return bytearray((int.from_bytes(unpack(row, width), 'little') + others).to_bytes(width, 'little')
+                     .translate(None, b'\x02'))
+
+
+def csr(n, sources, targets):
+    # CSR layout of the edges sources[k] -> targets[k] by counting sort, edges keep their order per state
+    offsets = array('q', bytes(8 * (n + 1)))
+    for i in sources:
+        offsets[i + 1] += 1
+    for i in range(n):
+        offsets[i + 1] += offsets[i]
+    fill = array('q', offsets[:n])
+    out = array('q', bytes(8 * len(targets)))
+    for i, j in zip(sources, targets):
+        out[fill[i]] = j
+        fill[i] += 1
+    return offsets, out
+
+
+def reverse(n, offsets, targets):
+    sources = array('q', bytes(8 * len(targets)))
+    for i in range(n):
+        for k in range(offsets[i], offsets[i + 1]):
+            sources[k] = i
+    return csr(n, targets, sources)
+
+
+class Game:
+
+    def __init__(self, players, owner, offsets, targets, props, labels, states=None, roffsets=None, sources=None):
+        self.players = list(players)
+        self.owner = owner
+        self.offsets = offsets
+        self.targets = targets
+        self.props = list(props)
+        self.prop_ids = {p: i for i, p in enumerate(self.props)}
+        self.labels = labels
+        self.states = states
+        self.size = len(owner)
+        self.digest = None  # fingerprint, made on first use
+        self.spread = None  # edge layout of pre, made on first use
+        if roffsets is None:
+            roffsets, sources = reverse(self.size, offsets, targets)
+        self.roffsets, self.sources = roffsets, sources
+
+    def __repr__(self):
+        return repr(f'Game | States: {self.size} | Edges: {len(self.targets)} | '
+                    f'Players: {self.players} | Props: {self.props}')
+
+    def __getstate__(self):  # the State objects stay behind when a Game is sent to another process
+        state = dict(self.__dict__)
+        state['states'] = None
+        state['spread'] = None
+        for k in ('owner', 'offsets', 'targets', 'roffsets', 'sources'):
+            if not isinstance(state[k], array):  # views of a memory-mapped file are sent as copies
+                state[k] = array('q', state[k])
+        return state
+
+    def fingerprint(self):
+        # content hash of players, owners, moves and propositions, the same for the same game in every process
+        if self.digest is None:
+            h = hashlib.blake2b(digest_size=16)
+            for name in self.players + [None] + self.props:
+                h.update(repr(name).encode('utf-8') + b'\0')
+            for a in (self.owner, self.offsets, self.targets):
+                a = array('q', a)
+                if sys.byteorder == 'big':
+                    a.byteswap()
+                h.update(a.tobytes())
+            for bits in self.labels:
+                h.update(bits.to_bytes((self.size + 7) // 8, 'little'))
+            self.digest = h.hexdigest()
+        return self.digest
+
+    def build_states(self):
+        # State objects for this game, e.g. to run Exp.check on a Game that was sent to another process
+        rows = [self.prop(p) for p in self.props]
+        out = [S.State([p for p, row in zip(self.props, rows) if row[i]],
+                       self.players[self.owner[i]] if self.owner[i] >= 0 else None) for i in range(self.size)]
+        for i, s in enumerate(out):
+            s.connections = [out[j] for j in self.successors(i)]
+        return out
+
+    def successors(self, i):
+        return self.targets[self.offsets[i]:self.offsets[i + 1]]
+
+    def predecessors(self, i):
+        return self.sources[self.roffsets[i]:self.roffsets[i + 1]]
+
+    def prop(self, name):
+        if name not in self.prop_ids:
+            return empty(self.size)
+        return unpack(self.labels[self.prop_ids[name]], self.size)
+
+    def coalition(self, players):
+        # the states controlled by a player in players
+        ids = bytearray(len(self.players) + 1)  # last slot catches owner -1
+        for i, p in enumerate(self.players):
+            if p in players:
+                ids[i] = 1
+        return bytearray(map(ids.__getitem__, self.owner))
+
+    def layout(self):
+        # the edges in one bit row with a guard bit after the edges of every state: edge k of state i is bit
+        #  k + i and the guard of state i bit offsets[i + 1] + i, then two pad bits so the row is never a
+        #  single bit. (gather, first edges, edges, guards, others, width): gather(z + b'\0') gives the bit of
+        #  every position as a tuple (the target's for an edge, 0 elsewhere), others has a byte 2 at every
+        #  position that isn't a guard, so the guards are what translate leaves of a row unpacked to bytes
+        if self.spread is None:
+            n, offsets, targets = self.size, self.offsets, self.targets
+            positions, marks, starts = array('q'), bytearray(), bytearray()
+            for i in range(n):
+                k = offsets[i + 1] - offsets[i]
+                positions.extend(targets[offsets[i]:offsets[i + 1]])
+                positions.append(n)
+                marks += b'\x01' * k + b'\x00'
+                starts += b'\x01' + bytes(k)
+            positions.extend((n, n))
+            marks += b'\x02\x02'
+            starts += bytes(2)
+            self.spread = (operator.itemgetter(*positions), pack(starts), pack(marks.replace(b'\x02', b'\x00')),
+                           pack(marks.translate(GUARDS)), int.from_bytes(marks.translate(OTHERS), 'little'),
+                           len(positions))
+        return self.spread
+
+    def pre(self, z, exists, choice=None):
+        # coalition predecessor of z: states in exists need some successor in z, the others all of them
+        #  choice, when given, gets for the states in exists and in the result the first successor in z
+        #  Without choice all states are done at once on the bit row of layout: adding the first edge bits
+        #  carries into the guard of a state exactly when all of its edges are set, so one addition tells
+        #  which states have every successor in z and one on the complement which have none
+        if choice is not None:
+            hit = bytes(map(z.__getitem__, self.targets))
+            offsets = self.offsets
+            out = bytearray(self.size)
+            for i in range(self.size):
+                edges = hit[offsets[i]:offsets[i + 1]]
+                out[i] = (1 in edges) if exists[i] else (0 not in edges)
+                if exists[i] and out[i]:
+                    choice[i] = self.targets[offsets[i] + edges.index(1)]
+            return out
+        gather, starts, edges, guard, others, width = self.layout()
+        hit = pack(bytes(gather(bytes(z) + b'\0')))
+        every = guards((hit + starts) & guard, width, others)
+        none = guards(((~hit & edges) + starts) & guard, width, others)
+        return disj(conj(exists, neg(none)), conj(neg(exists), every))
+
+    def attractor(self, target, allowed, exists, order=None, choice=None):
+        # least fixpoint of Z = target V (allowed ^ Pre(Z)), computed backwards from target so every
+        #  edge is looked at once
+        #  order, when given, gets the states of Z in the order they joined: a state that isn't in target
+        #  has some successor (exists) or all its successors (otherwise) earlier in it
+        #  choice, when given, gets for the states in exists that joined the successor they joined through,
+        #  so moving along choice reaches target
+        z = bytearray(target)
+        offsets, roffsets, sources = self.offsets, self.roffsets, self.sources
+        count = array('q', (offsets[i + 1] - offsets[i] for i in range(self.size)))
+        queue = [i for i in range(self.size) if z[i]]
+        for i in range(self.size):  # deadlocked states nobody can lead out of Z
+            if not z[i] and allowed[i] and not exists[i] and not count[i]:
+                z[i] = 1
+                queue.append(i)
+        if order is not None:
+            order.extend(queue)
+        while queue:
+            j = queue.pop()
+            for k in range(roffsets[j], roffsets[j + 1]):
+                i = sources[k]
+                if z[i] or not allowed[i]:
+                    continue
+                if not exists[i]:
+                    count[i] -= 1
+                    if count[i]:
+                        continue
+                elif choice is not None:
+                    choice[i] = j
+                z[i] = 1
+                queue.append(i)
+                if order is not None:
+                    order.append(i)
+        return z
+
+
+def compile(states):
+    # flattens every state reachable from states into a Game, the given states keep their positions
+    ids = {id(s): i for i, s in enumerate(states)}
+    order = list(states)
+    players, player_ids = [], {}
+    props, prop_ids = [], {}
+    owner = array('q')
+    offsets = array('q', [0])
+    targets = array('q')
+    rows = []
+    i = 0
+    while i < len(order):
+        s = order[i]
+        if s.player is None:
+            owner.append(-1)
+        else:
+            if s.player not in player_ids:
+                player_ids[s.player] = len(players)
+                players.append(s.player)
+            owner.append(player_ids[s.player])
+        for p in s.props:
+            if p not in prop_ids:
+                prop_ids[p] = len(props)
+                props.append(p)
+                rows.append([])
+            rows[prop_ids[p]].append(i)
+        for t in s.connections or []:
+            if id(t) not in ids:
+                ids[id(t)] = len(order)
+                order.append(t)
+            targets.append(ids[id(t)])
+        offsets.append(len(targets))
+        i += 1
+    labels = []
+    for row in rows:
+        a = bytearray(len(order))
+        for i in row:
+            a[i] = 1
+        labels.append(pack(a))
+    return Game(players, owner, offsets, targets, props, labels, order)
+
+
+def build(owners, edges, labels=None):
+    # bulk builder, no State objects involved
+    #  owners[i] is the player controlling state i (None for none), edges an iterable of (i, j) pairs and
+    #  labels maps each proposition to the states that have it
+    players, player_ids = [], {}
+    owner = array('q')
+    for p in owners:
+        if p is None:
+            owner.append(-1)
+            continue
+        if p not in player_ids:
+            player_ids[p] = len(players)
+            players.append(p)
+        owner.append(player_ids[p])
+    n = len(owner)
+    sources, targets = array('q'), array('q')
+    for i, j in edges:
+        if not (0 <= i < n and 0 <= j < n):
+            raise ValueError(f'Edge ({i}, {j}) is outside of the {n} states')
+        sources.append(i)
+        targets.append(j)
+    offsets, targets = csr(n, sources, targets)
+    props, rows = [], []
+    for p, members in (labels or {}).items():
+        a = bytearray(n)
+        for i in members:
+            a[i] = 1
+        props.append(p)
+        rows.append(pack(a))
+    return Game(players, owner, offsets, targets, props, rows)
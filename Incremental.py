@@ -0,0 +1,275 @@
+import Expressions as E
+import Game as G
+from util import parse
+
+# Incremental re-checking of a model that keeps changing. A Model holds the states (the given ones first,
+#  then every state reachable from them) with their successor and predecessor lists, and the labels of
+#  every subformula of the formulas checked on it, one 0/1 byte per state like Fixpoint. Edits are made
+#  through the model, which records the states they touch; the next test brings the labels up to date
+#  children first and only looks at
+#   PROP                    the states whose propositions changed
+#   ~, ^, V, ->             the states where an operand changed
+#   {A}@                    the predecessors of those, and the states whose successors changed
+#   {A}[] and {A} U         the same seeds, and every state that depends on them through its successors:
+#                           the predecessors, transitively, where the value isn't fixed by the operands
+#                           alone (phi holds for [], phi holds and psi doesn't for U). The fixpoint is solved
+#                           again on that region only, the other states keep their labels
+#  so the work of a re-check follows the size of the change instead of the size of the model.
+#  Formulas are labeled in their normal form (Exp.normalize), so they share their common subformulas
+
+
+class Model:
+
+    def __init__(self, states):
+        game = G.compile(states)
+        self.states = list(game.states)
+        self.index = {s: i for i, s in enumerate(self.states)}
+        self.successors = [list(game.successors(i)) for i in range(game.size)]
+        self.predecessors = [list(game.predecessors(i)) for i in range(game.size)]
+        self.labels = {}  # node -> bytearray over the states
+        self.order = []  # labeled nodes, children first
+        self.size = 0  # number of states the labels cover
+        self.touched = set()  # states whose propositions changed
+        self.rewired = set()  # states whose successors changed
+        self.recomputed = 0  # labels looked at by the last update
+
+    def __repr__(self):
+        return repr(f'Model | States: {len(self.states)} | Formulas: {len(self.order)} | '
+                    f'Pending: {len(self.touched | self.rewired) + len(self.states) - self.size}')
+
+    # Edits
+
+    def add_state(self, state):
+        # adds state, and the states reachable from it that aren't in the model yet
+        if state in self.index:
+            return self.index[state]
+        todo = [state]
+        self.add_index(state)
+        while todo:
+            s = todo.pop()
+            for t in s.connections or ():
+                if t not in self.index:
+                    self.add_index(t)
+                    todo.append(t)
+                self.link(self.index[s], self.index[t])
+        return self.index[state]
+
+    def add_index(self, state):
+        self.index[state] = len(self.states)
+        self.states.append(state)
+        self.successors.append([])
+        self.predecessors.append([])
+
+    def link(self, i, j):
+        if j not in self.successors[i]:
+            self.successors[i].append(j)
+            self.predecessors[j].append(i)
+            self.rewired.add(i)
+
+    def connect(self, source, target):
+        i, j = self.add_state(source), self.add_state(target)
+        source.connect(target)
+        self.link(i, j)
+
+    def disconnect(self, source, target):
+        i, j = self.index[source], self.index[target]
+        if j in self.successors[i]:
+            self.successors[i].remove(j)
+            self.predecessors[j].remove(i)
+            source.connections = [t for t in source.connections if t is not target]
+            self.rewired.add(i)
+
+    def add_prop(self, state, prop):
+        state.add_prop(prop)
+        self.touched.add(self.index[state])
+
+    def remove_prop(self, state, prop):
+        state.props = [p for p in state.props if p != prop]
+        self.touched.add(self.index[state])
+
+    # Checking
+
+    def add(self, exp):
+        # starts keeping the labels of exp, returns its normal form
+        if type(exp) is str:
+            exp = parse(exp)
+        exp = exp.normalize()
+        if exp in self.labels:
+            return exp
+        self.update()
+        everything = range(len(self.states))
+        stack = [exp]
+        while stack:
+            node = stack[-1]
+            if node in self.labels:
+                stack.pop()
+                continue
+            todo = [x for x in (node.subexp1, node.subexp2) if isinstance(x, E.Exp) and x not in self.labels]
+            if todo:
+                stack.extend(todo)
+                continue
+            stack.pop()
+            self.labels[node] = bytearray(len(self.states))
+            self.order.append(node)
+            self.relabel(node, everything)
+        return exp
+
+    def test(self, exp):
+        # whether exp holds, for every state of the model in order
+        exp = self.add(exp)
+        self.update()
+        return list(map(bool, self.labels[exp]))
+
+    def is_valid(self, exp):
+        return all(self.test(exp))
+
+    def update(self):
+        # brings every label up to date with the edits since the last update
+        n = len(self.states)
+        added = range(self.size, n)
+        if not self.touched and not self.rewired and not added:
+            return
+        self.recomputed = 0
+        changed = {}  # node -> states whose label changed
+        for node in self.order:
+            self.labels[node].extend(bytes(n - len(self.labels[node])))
+            op = node.op
+            if type(op) is int:
+                if op == E.CONST:
+                    seeds = set(added)
+                elif op == E.PROP:
+                    seeds = self.touched.union(added)
+                else:
+                    seeds = changed[node.subexp1].union(added)
+                    if isinstance(node.subexp2, E.Exp):
+                        seeds |= changed[node.subexp2]
+            elif op[E.OP] == E.CIRCLE:
+                seeds = self.rewired.union(added)
+                for j in changed[node.subexp1]:
+                    seeds.update(self.predecessors[j])
+            else:
+                seeds = self.rewired.union(added)
+                seeds |= changed[node.subexp1]
+                if isinstance(node.subexp2, E.Exp):
+                    seeds |= changed[node.subexp2]
+            changed[node] = self.relabel(node, seeds)
+        self.size = n
+        self.touched.clear()
+        self.rewired.clear()
+
+    def relabel(self, node, seeds):
+        # computes the labels of node again at seeds (and the states that depend on them for [] and U),
+        #  returns the states where they changed
+        bits = self.labels[node]
+        op = node.op
+        if type(op) is not int and op[E.OP] != E.CIRCLE:
+            return self.resolve(node, seeds)
+        changed = set()
+        for i in seeds:
+            self.recomputed += 1
+            if type(op) is not int:  # CIRCLE
+                sub = self.labels[node.subexp1]
+                out = self.pre(i, lambda j: sub[j], self.states[i].player in op[E.PLAYERS])
+            elif op == E.CONST:
+                out = bool(node.subexp1)
+            elif op == E.PROP:
+                out = self.states[i].has(node.subexp1)
+            elif op == E.NEG:
+                out = not self.labels[node.subexp1][i]
+            else:
+                a, b = self.labels[node.subexp1][i], self.labels[node.subexp2][i]
+                if op == E.CONJ:
+                    out = a and b
+                elif op == E.DISJ:
+                    out = a or b
+                else:  # op == IMPL
+                    out = not a or b
+            if bits[i] != out:
+                bits[i] = out
+                changed.add(i)
+        return changed
+
+    def pre(self, i, z, exists):
+        if exists:
+            return any(z(j) for j in self.successors[i])
+        return all(z(j) for j in self.successors[i])
+
+    def resolve(self, node, seeds):
+        # [] and U on the region that depends on seeds, as the least fixpoint Z = target V (allowed ^ Pre(Z))
+        #  with the states outside the region fixed; for [] Z is the opponents' attractor to ~phi
+        bits = self.labels[node]
+        players = node.op[E.PLAYERS]
+        phi = self.labels[node.subexp1]
+        if node.op[E.OP] == E.SQUARE:
+            flip = True
+
+            def target(i):
+                return not phi[i]
+
+            def allowed(i):
+                return True
+
+            def exists(i):
+                return self.states[i].player not in players
+
+            def open(i):  # the label depends on the successors
+                return phi[i]
+        else:  # UNTIL
+            psi = self.labels[node.subexp2]
+            flip = False
+
+            def target(i):
+                return psi[i]
+
+            def allowed(i):
+                return phi[i]
+
+            def exists(i):
+                return self.states[i].player in players
+
+            def open(i):
+                return phi[i] and not psi[i]
+
+        region = set(seeds)
+        todo = list(region)
+        while todo:
+            for i in self.predecessors[todo.pop()]:
+                if i not in region and open(i):
+                    region.add(i)
+                    todo.append(i)
+        self.recomputed += len(region)
+
+        z = {}  # Z on the region
+        count = {}  # successors of the other players' states still outside Z
+        queue = []
+        for i in region:
+            z[i] = False
+            if target(i):
+                z[i] = True
+            elif allowed(i):
+                if exists(i):
+                    z[i] = any(bits[j] != flip for j in self.successors[i] if j not in region)
+                else:
+                    count[i] = sum(1 for j in self.successors[i] if j in region or bits[j] == flip)
+                    z[i] = not count[i]
+            if z[i]:
+                queue.append(i)
+        while queue:
+            j = queue.pop()
+            for i in self.predecessors[j]:
+                if i not in region or z[i] or not allowed(i):
+                    continue
+                if not exists(i):
+                    count[i] -= 1
+                    if count[i]:
+                        continue
+                z[i] = True
+                queue.append(i)
+
+        changed = set()
+        for i in region:
+            out = z[i] != flip
+            if bits[i] != out:
+                bits[i] = out
+                changed.add(i)
+        return changed
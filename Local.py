@@ -0,0 +1,84 @@
+import collections
+import weakref
+import States as S
+from util import parse
+
+# On-the-fly (local) model checking of games too large to build up front. The game is given by callbacks on
+#  state keys (any hashable value):
+#   successors(key)     iterable of the keys of the successors, in the same order every time
+#   labels(key)         iterable of the propositions that hold in key
+#   player(key)         the player controlling key, or None
+#  Exp.check runs on Nodes that stand for the keys and generate their successors when the search first
+#  asks for them, so only the states the formula needs are ever looked at: the search stops as soon as a
+#  result is decided (one successor for the controlling side, a counterexample for the other).
+#  The successor lists of the limit most recently expanded states are kept, older ones are generated again
+#  when needed, and the search memoizes at most limit results (Exp.check limit). So the states held at once
+#  are those plus the current search path; a search that must see the whole reachable part (e.g. {A}[] on
+#  an infinite path) only ends when that part is finite
+
+
+class Node:
+    # a state of an implicit game, looks like a States.State to Exp.check
+    __slots__ = ('key', 'player', 'mask', 'space', '__weakref__')
+
+    def __init__(self, key, space):
+        self.key = key
+        self.space = space
+        self.player = space.player(key)
+        self.mask = S.prop_mask(space.labels(key))
+
+    def __repr__(self):
+        return repr(f'Node | Key: {self.key} | Player: {self.player} | Props: {self.props}')
+
+    props = S.State.props
+
+    @property
+    def connections(self):
+        return self.space.expand(self)
+
+    def has(self, prop):
+        return (self.mask >> S.PROP_IDS.get(prop, S.UNKNOWN)) & 1 == 1
+
+
+class Space:
+
+    def __init__(self, successors, labels, player, limit=1 << 16):
+        self.successors = successors
+        self.labels = labels
+        self.player = player
+        self.limit = limit
+        self.nodes = weakref.WeakValueDictionary()  # key -> Node, one object per key while the search holds it
+        self.store = collections.OrderedDict()  # key -> successor Nodes, least recently used first
+        self.expanded = 0  # calls of successors
+
+    def node(self, key):
+        node = self.nodes.get(key)
+        if node is None:
+            node = self.nodes[key] = Node(key, self)
+        return node
+
+    def expand(self, node):
+        out = self.store.get(node.key)
+        if out is not None:
+            self.store.move_to_end(node.key)
+            return out
+        self.expanded += 1
+        out = [self.node(k) for k in dict.fromkeys(self.successors(node.key))]  # each successor once, in order
+        self.store[node.key] = out
+        if len(self.store) > self.limit:
+            self.store.popitem(last=False)
+        return out
+
+    def check(self, exp, initial, profile=None):
+        # whether exp holds in the state with key initial
+        #  (no EvalCache or components here, they would make the search look at the whole game)
+        if type(exp) is str:
+            exp = parse(exp)
+        return exp.check(self.node(initial), profile=profile, limit=self.limit)
+
+    def stats(self):
+        return {'expanded': self.expanded, 'stored': len(self.store), 'live': len(self.nodes)}
+
+
+def check(exp, initial, successors, labels, player, limit=1 << 16, profile=None):
+    return Space(successors, labels, player, limit).check(exp, initial, profile)
@@ -0,0 +1,314 @@
+import bisect
+import multiprocessing
+import os
+import time
+from array import array
+from multiprocessing import shared_memory
+import Expressions as E
+import Fixpoint as F
+import Game as G
+from util import parse
+
+# Partitioned labeling of one large Game on several processes, the bottom-up labeling of Fixpoint with the
+#  work on the edges split between workers. The Game arrays (owner, offsets, targets, roffsets, sources) are
+#  copied once into shared memory and every worker reads them through int64 views of it, so the graph is
+#  never sent. The states are cut in contiguous ranges of about the same number of states plus edges, one
+#  per worker, and the labels of every subformula are rows of shared memory as well:
+#   ~, ^, V, ->     done by the coordinating process, a pass over the whole row that no worker would beat
+#   {A}@            every worker computes Pre_A for its own states, reading the row of phi wherever it is
+#   {A}[], {A} U    the attractor of Game.attractor in bulk-synchronous rounds: in a round every worker runs
+#                   the backward worklist on its own states, and a predecessor in another partition is not
+#                   touched but sent to the worker that owns it. The coordinator hands those messages on and
+#                   the next round starts from them, until a round sends nothing
+#  so the only data that moves between processes are the moves into Z crossing a partition boundary.
+#  Use a Cluster for several formulas on the same game, its workers stay up until it is closed
+
+OWNER, OFFSETS, TARGETS, ROFFSETS, SOURCES = range(5)
+ARRAYS = ('owner', 'offsets', 'targets', 'roffsets', 'sources')
+
+
+def share(data):
+    # a new block of shared memory holding data, at least one int64 long so an empty array can be shared too
+    block = shared_memory.SharedMemory(create=True, size=max(8, len(data)))
+    block.buf[:len(data)] = data
+    return block
+
+
+def serve(conn, names, sizes, bounds, k):
+    # a worker: owns the states bounds[k] to bounds[k + 1] and answers the commands of the Cluster
+    #  sizes are the lengths of the Game arrays, the blocks can be longer
+    lo, hi = bounds[k], bounds[k + 1]
+    parts = len(bounds) - 1
+    blocks = [shared_memory.SharedMemory(name) for name in names]
+    views = [block.buf[:8 * size].cast('q') for block, size in zip(blocks, sizes)]  # read in place, not copied
+    offsets, targets, roffsets, sources = views[OFFSETS], views[TARGETS], views[ROFFSETS], views[SOURCES]
+    rows = {}  # name -> SharedMemory of a label row
+
+    def row(name):
+        if name is None:
+            return None
+        if name not in rows:
+            rows[name] = shared_memory.SharedMemory(name)
+        return rows[name].buf
+
+    job = None  # the attractor of the current rounds: z, allowed, exists, count, outboxes
+    while True:
+        cmd, *args = conn.recv()
+        if cmd == 'pre':
+            out, z, exists = map(row, args)
+            for i in range(lo, hi):
+                if exists[i]:
+                    out[i] = any(z[targets[j]] for j in range(offsets[i], offsets[i + 1]))
+                else:
+                    out[i] = all(z[targets[j]] for j in range(offsets[i], offsets[i + 1]))
+            conn.send(None)
+        elif cmd == 'start':
+            z, allowed, exists = map(row, args)
+            count = array('q', (offsets[i + 1] - offsets[i] for i in range(lo, hi)))
+            job = (z, allowed, exists, count)
+            queue = [i for i in range(lo, hi) if z[i]]
+            for i in range(lo, hi):  # deadlocked states nobody can lead out of Z
+                if not z[i] and (allowed is None or allowed[i]) and not exists[i] and not count[i - lo]:
+                    z[i] = 1
+                    queue.append(i)
+            conn.send(drain(job, queue, lo, hi, bounds, parts, roffsets, sources))
+        elif cmd == 'round':
+            z, allowed, exists, count = job
+            queue = []
+            for i in args[0]:  # predecessors of states that joined Z in other partitions
+                if z[i] or allowed is not None and not allowed[i]:
+                    continue
+                if not exists[i]:
+                    count[i - lo] -= 1
+                    if count[i - lo]:
+                        continue
+                z[i] = 1
+                queue.append(i)
+            conn.send(drain(job, queue, lo, hi, bounds, parts, roffsets, sources))
+        elif cmd == 'drop':
+            job = None
+            for name in args[0]:
+                if name in rows:
+                    rows.pop(name).close()
+        else:  # 'stop'
+            break
+    job = None
+    for block in rows.values():
+        block.close()
+    for view in views:
+        view.release()
+    for block in blocks:
+        block.close()
+    conn.close()
+
+
+def drain(job, queue, lo, hi, bounds, parts, roffsets, sources):
+    # the backward worklist of Game.attractor on the states lo to hi, returns the predecessors found in
+    #  other partitions as one array per partition
+    z, allowed, exists, count = job
+    outboxes = [array('q') for _ in range(parts)]
+    while queue:
+        j = queue.pop()
+        for k in range(roffsets[j], roffsets[j + 1]):
+            i = sources[k]
+            if not lo <= i < hi:
+                outboxes[bisect.bisect_right(bounds, i) - 1].append(i)
+                continue
+            if z[i] or allowed is not None and not allowed[i]:
+                continue
+            if not exists[i]:
+                count[i - lo] -= 1
+                if count[i - lo]:
+                    continue
+            z[i] = 1
+            queue.append(i)
+    return outboxes
+
+
+class Cluster:
+
+    def __init__(self, game, workers=None):
+        # game is a compiled Game, workers the number of processes (default: number of cores)
+        self.game = game
+        n = game.size
+        workers = max(1, min(workers or os.cpu_count() or 1, n))
+        offsets = game.offsets
+        # partition k starts at the first state with k / workers of the states plus edges before it
+        total = n + offsets[n]
+        self.bounds = [0] + [bisect.bisect_left(range(n), k * total / workers, key=lambda i: i + offsets[i])
+                             for k in range(1, workers)] + [n]
+        arrays = [array('q', getattr(game, key)) for key in ARRAYS]
+        self.blocks = [share(a.tobytes()) for a in arrays]
+        sizes = [len(a) for a in arrays]
+        self.rows = []  # label rows made for the current formula
+        self.rounds = 0  # rounds of the attractors so far
+        self.messages = 0  # states sent between partitions so far
+        names = [block.name for block in self.blocks]
+        self.conns, self.procs = [], []
+        for k in range(workers):
+            parent, child = multiprocessing.Pipe()
+            proc = multiprocessing.Process(target=serve, args=(child, names, sizes, self.bounds, k), daemon=True)
+            proc.start()
+            child.close()
+            self.conns.append(parent)
+            self.procs.append(proc)
+
+    def __repr__(self):
+        return repr(f'Cluster | States: {self.game.size} | Workers: {len(self.procs)} | Rounds: {self.rounds} | '
+                    f'Messages: {self.messages}')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        # stops the workers and frees the shared memory, also after a worker died
+        if not self.procs:
+            return
+        stopped = False
+        try:
+            self.drop()
+            for conn in self.conns:
+                conn.send(('stop',))
+            stopped = True
+        except OSError:  # a worker is gone, the others are terminated below
+            pass
+        finally:
+            for proc in self.procs:
+                if not stopped:
+                    proc.terminate()
+                proc.join()
+            for conn in self.conns:
+                conn.close()
+            self.conns, self.procs = [], []
+            for block in self.blocks:
+                block.close()
+                block.unlink()
+
+    def row(self, data):
+        block = share(data)
+        self.rows.append(block)
+        return block
+
+    def drop(self):
+        # frees the label rows, in the workers first
+        names = [block.name for block in self.rows]
+        try:
+            for conn in self.conns:
+                conn.send(('drop', names))
+        finally:
+            for block in self.rows:
+                block.close()
+                block.unlink()
+            self.rows = []
+
+    def broadcast(self, *cmd):
+        for conn in self.conns:
+            conn.send(cmd)
+        return [conn.recv() for conn in self.conns]
+
+    def pre(self, z, exists):
+        out = self.row(bytes(self.game.size))
+        self.broadcast('pre', out.name, z.name, self.row(exists).name)
+        return out
+
+    def attractor(self, target, allowed, exists):
+        # least fixpoint of Z = target V (allowed ^ Pre(Z)), allowed None for every state
+        z = self.row(target)
+        allowed = None if allowed is None else self.row(allowed).name
+        outboxes = self.broadcast('start', z.name, allowed, self.row(exists).name)
+        while any(map(len, (box for boxes in outboxes for box in boxes))):
+            self.rounds += 1
+            for k, conn in enumerate(self.conns):
+                inbox = array('q')
+                for boxes in outboxes:
+                    inbox.extend(boxes[k])
+                self.messages += len(inbox)
+                conn.send(('round', inbox))
+            outboxes = [conn.recv() for conn in self.conns]
+        return z
+
+    def compute(self, exp, memo):
+        # the row of exp from the rows of its children, which must already be in memo
+        game = self.game
+        n = game.size
+
+        def bits(node):
+            return bytes(memo[node].buf[:n])
+
+        if type(exp.op) is int:
+            if exp.op == E.CONST:
+                return self.row(G.full(n) if exp.subexp1 else G.empty(n))
+            elif exp.op == E.PROP:
+                return self.row(game.prop(exp.subexp1))
+            elif exp.op == E.NEG:
+                return self.row(G.neg(bits(exp.subexp1)))
+            a, b = bits(exp.subexp1), bits(exp.subexp2)
+            if exp.op == E.DISJ:
+                return self.row(G.disj(a, b))
+            elif exp.op == E.IMPL:
+                return self.row(G.disj(G.neg(a), b))
+            else:  # exp.op == CONJ
+                return self.row(G.conj(a, b))
+        op, players = exp.op[E.OP], exp.op[E.PLAYERS]
+        if op == E.CIRCLE:
+            return self.pre(memo[exp.subexp1], game.coalition(players))
+        elif op == E.SQUARE:
+            z = self.attractor(G.neg(bits(exp.subexp1)), None, G.neg(game.coalition(players)))
+            return self.row(G.neg(bytes(z.buf[:n])))
+        elif op == E.UNTIL:
+            return self.attractor(bits(exp.subexp2), bits(exp.subexp1), game.coalition(players))
+        elif op == E.AVOID or op == E.DIAMOND:  # same expansions as Exp.check
+            return memo[exp.expand()]
+        raise ValueError(f'Unknown operator: {exp.op}')
+
+    def label(self, exp, profile=None):
+        # for each state of the game whether exp holds in it, like Fixpoint.label on the same Game
+        #  with a profile, the iterations of [] and U are their rounds
+        if type(exp) is str:
+            exp = parse(exp)
+        if profile is not None:
+            profile.checks += 1
+            begin = time.perf_counter()
+        memo = {}
+        stack = [exp.normalize()]
+        try:
+            while stack:
+                node = stack[-1]
+                if node in memo:
+                    stack.pop()
+                    continue
+                todo = [x for x in F.children(node) if x not in memo]
+                if todo:
+                    stack.extend(todo)
+                    continue
+                stack.pop()
+                if profile is None:
+                    memo[node] = self.compute(node, memo)
+                else:
+                    start, rounds = time.perf_counter(), self.rounds
+                    memo[node] = self.compute(node, memo)
+                    row = profile.row(node)
+                    row[E.CALLS] += 1
+                    row[E.ITERATIONS] += self.rounds - rounds
+                    row[E.SECONDS] += time.perf_counter() - start
+            out = list(map(bool, memo[exp.normalize()].buf[:self.game.size]))
+        finally:
+            memo = None
+            self.drop()
+        if profile is not None:
+            profile.seconds += time.perf_counter() - begin
+        return out
+
+    def stats(self):
+        return {'workers': len(self.procs), 'bounds': self.bounds, 'rounds': self.rounds, 'messages': self.messages}
+
+
+def label(exp, model, workers=None, profile=None):
+    # like Fixpoint.label on a Cluster started for this formula, model is a compiled Game or a list of States
+    game = model if isinstance(model, G.Game) else G.compile(model)
+    with Cluster(game, workers) as cluster:
+        out = cluster.label(exp, profile)
+    return out if isinstance(model, G.Game) else out[:len(model)]
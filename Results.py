@@ -0,0 +1,157 @@
+import sqlite3
+import threading
+import time
+import Game as G
+
+# Results of earlier checks kept on disk, so runs in other processes (e.g. every night, on models that
+#  barely changed) don't check the same formulas again. Entries are keyed by fingerprints:
+#   model       Game.fingerprint of the compiled model (players, owners, moves and propositions)
+#   formula     Exp.fingerprint of the normal form, so formulas that only differ in how they're written match
+#   states      how many of the model's states the entry covers, the given ones come first in the Game
+#  and hold either the labels of those states (bit-packed) or only the validity verdict.
+#  The file is SQLite, so processes can share it. When the stored labels pass limit bytes the least
+#  recently used entries are dropped. The size is counted once when the file is opened and kept up to date
+#  by this process, and the times entries were used are written in batches (every FLUSH hits, on put, flush
+#  and close), so a hit costs one query
+
+SCHEMA = '''CREATE TABLE IF NOT EXISTS results (
+    model TEXT, formula TEXT, states INTEGER, valid INTEGER, bits BLOB, used REAL,
+    PRIMARY KEY (model, formula, states))'''
+ROW = 64  # bytes counted for an entry besides its labels
+FLUSH = 256  # hits whose use times are kept before they are written
+
+
+class ResultCache:
+
+    def __init__(self, path, limit=1 << 26):
+        self.path = path
+        self.limit = limit
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(SCHEMA)
+        self.db.commit()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.used = {}  # (model, formula, states) -> time of the hits not written yet
+        self.size, self.count = self.db.execute(
+            'SELECT COALESCE(SUM(LENGTH(bits)), 0), COUNT(*) FROM results').fetchone()
+
+    def __repr__(self):
+        return repr(f'ResultCache | Path: {self.path} | Entries: {len(self)}')
+
+    def __len__(self):
+        with self.lock:
+            return self.db.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+    def flush(self):
+        # writes the use times of the hits since the last flush
+        with self.lock:
+            self.write_used()
+            self.db.commit()
+
+    def write_used(self):
+        if self.used:
+            self.db.executemany('UPDATE results SET used = ? WHERE model = ? AND formula = ? AND states = ?',
+                                [(t, *k) for k, t in self.used.items()])
+            self.used.clear()
+
+    def find(self, query, args):
+        with self.lock:
+            row = self.db.execute(query, args).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.used[(args[0], args[1], row[0])] = time.time()
+            if len(self.used) >= FLUSH:
+                self.write_used()
+                self.db.commit()
+            return row
+
+    def labels(self, model, formula, n):
+        # labels of the first n states, None if they aren't stored
+        row = self.find('SELECT states, bits FROM results WHERE model = ? AND formula = ? AND states >= ? '
+                        'AND bits IS NOT NULL ORDER BY states LIMIT 1', (model, formula, n))
+        if row is None:
+            return None
+        return list(map(bool, G.unpack(int.from_bytes(row[1], 'little'), row[0])[:n]))
+
+    def valid(self, model, formula, n):
+        # whether the formula holds in the first n states, None if that isn't known
+        row = self.find('SELECT states, valid, bits FROM results WHERE model = ? AND formula = ? AND '
+                        '(states = ? OR states > ? AND bits IS NOT NULL) ORDER BY states LIMIT 1',
+                        (model, formula, n, n))
+        if row is None:
+            return None
+        if row[0] == n:
+            return bool(row[1])
+        return all(G.unpack(int.from_bytes(row[2], 'little'), row[0])[:n])
+
+    def put_labels(self, model, formula, labels):
+        n = len(labels)
+        bits = G.pack(bytearray(map(bool, labels))).to_bytes((n + 7) // 8, 'little')
+        self.put(model, formula, n, all(labels), bits)
+
+    def put_valid(self, model, formula, n, valid):
+        with self.lock:
+            known = self.db.execute('SELECT 1 FROM results WHERE model = ? AND formula = ? AND states = ?',
+                                    (model, formula, n)).fetchone()
+        if known is None:  # don't replace labels with a bare verdict
+            self.put(model, formula, n, valid, None)
+
+    def put(self, model, formula, n, valid, bits):
+        with self.lock:
+            old = self.db.execute('SELECT COALESCE(LENGTH(bits), 0) FROM results WHERE model = ? AND formula = ? '
+                                  'AND states = ?', (model, formula, n)).fetchone()
+            self.db.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)',
+                            (model, formula, n, int(valid), bits, time.time()))
+            self.used.pop((model, formula, n), None)
+            if old is None:
+                self.count += 1
+            else:
+                self.size -= old[0]
+            self.size += len(bits) if bits is not None else 0
+            self.write_used()
+            self.evict()
+            self.db.commit()
+
+    def evict(self):
+        # drops the least recently used entries until the rest fits in limit
+        if self.size + ROW * self.count <= self.limit:
+            return
+        for model, formula, n, length in self.db.execute(
+                'SELECT model, formula, states, COALESCE(LENGTH(bits), 0) FROM results ORDER BY used').fetchall():
+            if self.size + ROW * self.count <= self.limit:
+                break
+            self.db.execute('DELETE FROM results WHERE model = ? AND formula = ? AND states = ?', (model, formula, n))
+            self.size -= length
+            self.count -= 1
+
+    def clear(self):
+        with self.lock:
+            self.db.execute('DELETE FROM results')
+            self.db.commit()
+            self.used.clear()
+            self.size = self.count = 0
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': self.count, 'bytes': self.size + ROW * self.count}
+
+
+def model_key(states):
+    # (model fingerprint, number of states) of a list of States or a Game; the list is compiled and hashed,
+    #  so when the same model is checked many times get this once and pass it on (ATL.test model=)
+    if isinstance(states, G.Game):
+        return states.fingerprint(), states.size
+    return G.compile(states).fingerprint(), len(states)
+
+
+def fingerprints(exp, states, model=None):
+    # (model, formula, number of states) keys of checking exp on states, a list of States or a Game
+    #  model is model_key(states) when the caller has it already
+    fingerprint, n = model_key(states) if model is None else model
+    return fingerprint, exp.fingerprint(), n
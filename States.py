@@ -1,28 +1,159 @@
-BLANK = 0
-GREEN = 1
-
-
-class State:
-    
-    def __init__(self, props, player=None, connections=None):
-        self.player = player
-        self.props = props
-        self.connections = connections
-        self.color = BLANK
-
-    def __repr__(self):
-        return repr(f'State | Player: {self.player} | Props: {self.props} | Connections: {self.connections}')
-        
-    def connect(self, alt_state):
-        if self.connections is None:
-            self.connections = alt_state
-        elif alt_state not in self.connections:
-            self.connections.append(alt_state)
-    
-    def fill(self):
-        self.color = GREEN
-        pass
-    
-    def clear(self):
-        self.color = BLANK
-        pass
+import sys
+import threading
+
+# Propositions are interned: every name gets a small integer id shared by all states, and a state keeps
+#  its propositions as a bitmask of those ids
+PROP_IDS = {}
+PROP_NAMES = []
+UNKNOWN = sys.maxsize  # shift for names no state has, leaves no bit
+
+# Successor lists up to this length are searched directly, longer ones also keep a set for connect
+SCAN = 8
+
+
+def prop_id(name):
+    if name not in PROP_IDS:
+        PROP_IDS[name] = len(PROP_NAMES)
+        PROP_NAMES.append(name)
+    return PROP_IDS[name]
+
+
+def prop_mask(props):
+    mask = 0
+    for p in props:
+        mask |= 1 << prop_id(p)
+    return mask
+
+
+class State:
+    # __slots__ keeps a state to a few words: player, proposition bitmask, successor list and, for states
+    #  with many successors, the set used to keep them unique
+    __slots__ = ('player', 'mask', '_connections', '_linked')
+
+    def __init__(self, props, player=None, connections=None):
+        self.player = player
+        self.mask = prop_mask(props)
+        self.connections = connections
+
+    def __repr__(self):
+        return repr(f'State | Player: {self.player} | Props: {self.props} | Connections: {self.connections}')
+
+    def __getstate__(self):  # bitmask ids are only meaningful in this process, so pickle the names
+        return self.player, self.props, self._connections
+
+    def __setstate__(self, state):
+        self.player, props, self._connections = state
+        self.mask = prop_mask(props)
+        self._linked = None
+
+    @property
+    def props(self):
+        mask, out, i = self.mask, [], 0
+        while mask:
+            if mask & 1:
+                out.append(PROP_NAMES[i])
+            mask >>= 1
+            i += 1
+        return out
+
+    @props.setter
+    def props(self, props):
+        self.mask = prop_mask(props)
+
+    @property
+    def connections(self):
+        return self._connections
+
+    @connections.setter
+    def connections(self, states):
+        self._connections = None
+        self._linked = None
+        if states is not None:
+            self._connections = []
+            self.connect(states)
+
+    def has(self, prop):
+        # PROP check: one dict lookup and a bit test instead of a scan over the proposition names
+        return (self.mask >> PROP_IDS.get(prop, UNKNOWN)) & 1 == 1
+
+    def add_prop(self, prop):
+        self.mask |= 1 << prop_id(prop)
+
+    def connect(self, alt_state):
+        # alt_state is a State or a list of States, each is added once
+        if self._connections is None:
+            self._connections = []
+        for s in alt_state if isinstance(alt_state, (list, tuple)) else (alt_state,):
+            if self._linked is not None:
+                if s in self._linked:
+                    continue
+                self._linked.add(s)
+            elif s in self._connections:
+                continue
+            self._connections.append(s)
+            if self._linked is None and len(self._connections) > SCAN:
+                self._linked = set(self._connections)
+
+
+class Components:
+    # Strongly connected components of a State graph, found on demand: of(state) numbers every state reachable
+    #  from state that wasn't numbered before (iterative Tarjan). The states reachable from a numbered state
+    #  are numbered too, and a component only reaches components with a smaller or equal number, so the
+    #  numbers are a reverse topological order of the condensation.
+    # A search that goes from one component into another can't get back, the evaluator uses that to start a
+    #  new (memoized) search there. Clear it when connections change
+    def __init__(self):
+        self.number = {}  # State -> component
+        self.count = 0
+        self.lock = threading.Lock()  # for pools of threads sharing one
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.number.clear()
+        self.count = 0
+
+    def of(self, state):
+        if state not in self.number:
+            with self.lock:
+                if state not in self.number:
+                    self.explore(state)
+        return self.number[state]
+
+    def explore(self, root):
+        number = self.number
+        index = {root: 0}
+        low = [0]  # by index
+        stack, on_stack = [root], {root}
+        work = [[root, 0]]  # state, next successor
+        while work:
+            frame = work[-1]
+            v = frame[0]
+            nearest = v.connections or ()
+            if frame[1] < len(nearest):
+                w = nearest[frame[1]]
+                frame[1] += 1
+                if w in number:
+                    continue  # in a component found before
+                if w not in index:
+                    index[w] = len(low)
+                    low.append(len(low))
+                    stack.append(w)
+                    on_stack.add(w)
+                    work.append([w, 0])
+                elif w in on_stack:
+                    low[index[v]] = min(low[index[v]], index[w])
+                continue
+            work.pop()
+            if work:
+                u = index[work[-1][0]]
+                low[u] = min(low[u], low[index[v]])
+            if low[index[v]] == index[v]:
+                while True:
+                    w = stack.pop()
+                    on_stack.discard(w)
+                    number[w] = self.count
+                    if w is v:
+                        break
+                self.count += 1
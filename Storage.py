@@ -0,0 +1,179 @@
+import mmap
+import struct
+import sys
+from array import array
+import Game as G
+
+# On-disk models
+#
+#   Edge list (what simulators export), read as a stream so only the compiled arrays are ever in memory:
+#       <name>.edges    little-endian int64 pairs: source, target
+#       <name>.states   one text line per state: player, a tab, then its propositions separated by commas
+#                       (an empty player means no player controls it)
+#
+#   Compiled game, written by save and memory-mapped by load, the arrays are used straight from the file:
+#       header          MAGIC, then uint64: version, states, edges, players, props, table bytes
+#       table           player and proposition names, utf-8, each preceded by its uint32 byte length
+#       arrays          int64: owner, offsets, targets, roffsets, sources (the Game arrays)
+#       labels          per proposition, the bit-packed row of the proposition matrix
+#   Every section is padded to 8 bytes.
+
+MAGIC = b'ATLGAME\0'
+VERSION = 1
+HEADER = struct.Struct('<8s6Q')
+CHUNK = 1 << 20  # edges read at a time
+
+
+def pad(k):
+    return -k % 8
+
+
+def little(a):
+    # array in little-endian byte order for the file
+    if sys.byteorder == 'big':
+        a = array(a.typecode, a)
+        a.byteswap()
+    return a
+
+
+def write_edges(path, edges):
+    # streams (source, target) pairs to an edge list file
+    with open(path, 'wb') as f:
+        buf = array('q')
+        for i, j in edges:
+            buf.append(i)
+            buf.append(j)
+            if len(buf) >= 2 * CHUNK:
+                little(buf).tofile(f)
+                del buf[:]
+        little(buf).tofile(f)
+
+
+def write_states(path, owners, props):
+    # owners[i] and props[i] are the player and the propositions of state i
+    with open(path, 'w', encoding='utf-8') as f:
+        for player, names in zip(owners, props):
+            f.write(f'{"" if player is None else player}\t{",".join(names)}\n')
+
+
+def read_edges(path):
+    # yields the edge list one chunk (an int64 array of source, target, ...) at a time
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(16 * CHUNK)
+            if not data:
+                return
+            if len(data) % 16:
+                raise ValueError(f'{path} is not a list of int64 pairs')
+            chunk = array('q')
+            chunk.frombytes(data)
+            if sys.byteorder == 'big':
+                chunk.byteswap()
+            yield chunk
+
+
+def load_edges(edge_path, state_path):
+    # Game from an edge list and its state table. The edge file is read twice, once to count the
+    #  successors of every state and once to place them, so memory is the compiled arrays plus one chunk
+    players, player_ids, owner = [], {}, array('q')
+    props, prop_ids, rows = [], {}, []
+    with open(state_path, encoding='utf-8') as f:
+        for i, line in enumerate(f):
+            player, _, names = line.rstrip('\n').partition('\t')
+            if not player:
+                owner.append(-1)
+            else:
+                if player not in player_ids:
+                    player_ids[player] = len(players)
+                    players.append(player)
+                owner.append(player_ids[player])
+            for p in names.split(',') if names else ():
+                if p not in prop_ids:
+                    prop_ids[p] = len(props)
+                    props.append(p)
+                    rows.append(array('q'))
+                rows[prop_ids[p]].append(i)
+    n = len(owner)
+
+    offsets = array('q', bytes(8 * (n + 1)))
+    for chunk in read_edges(edge_path):
+        for k in range(0, len(chunk), 2):
+            i, j = chunk[k], chunk[k + 1]
+            if not (0 <= i < n and 0 <= j < n):
+                raise ValueError(f'Edge ({i}, {j}) is outside of the {n} states')
+            offsets[i + 1] += 1
+    for i in range(n):
+        offsets[i + 1] += offsets[i]
+    fill = array('q', offsets[:n])
+    targets = array('q', bytes(8 * offsets[n]))
+    for chunk in read_edges(edge_path):
+        for k in range(0, len(chunk), 2):
+            i = chunk[k]
+            targets[fill[i]] = chunk[k + 1]
+            fill[i] += 1
+
+    labels = []
+    for row in rows:
+        a = bytearray(n)
+        for i in row:
+            a[i] = 1
+        labels.append(G.pack(a))
+    return G.Game(players, owner, offsets, targets, props, labels)
+
+
+def save(game, path):
+    table = bytearray()
+    for name in game.players + game.props:
+        b = str(name).encode('utf-8')
+        table += struct.pack('<I', len(b)) + b
+    table += bytes(pad(len(table)))
+    row_bytes = (game.size + 7) // 8
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, game.size, len(game.targets), len(game.players), len(game.props),
+                            len(table)))
+        f.write(table)
+        for a in (game.owner, game.offsets, game.targets, game.roffsets, game.sources):
+            little(array('q', a)).tofile(f)
+        for bits in game.labels:
+            f.write(bits.to_bytes(row_bytes, 'little'))
+        f.write(bytes(pad(row_bytes * len(game.labels))))
+
+
+def load(path, mapped=True):
+    # Game from a file written by save. With mapped the arrays are views of the memory-mapped file, pages
+    #  are read on demand and shared between processes; otherwise they are copied into memory
+    with open(path, 'rb') as f:
+        if mapped:
+            data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        else:
+            data = memoryview(f.read())
+    magic, version, n, m, num_players, num_props, table_len = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f'{path} is not a compiled game (version {VERSION})')
+
+    names, at = [], HEADER.size
+    while len(names) < num_players + num_props:
+        k, = struct.unpack_from('<I', data, at)
+        names.append(bytes(data[at + 4:at + 4 + k]).decode('utf-8'))
+        at += 4 + k
+    at = HEADER.size + table_len
+
+    arrays = []
+    for length in (n, n + 1, m, n + 1, m):
+        view = data[at:at + 8 * length]
+        if mapped and sys.byteorder == 'little':
+            arrays.append(view.cast('q'))
+        else:
+            a = array('q')
+            a.frombytes(view)
+            arrays.append(little(a))
+        at += 8 * length
+    owner, offsets, targets, roffsets, sources = arrays
+
+    row_bytes = (n + 7) // 8
+    labels = []
+    for _ in range(num_props):
+        labels.append(int.from_bytes(data[at:at + row_bytes], 'little'))
+        at += row_bytes
+    return G.Game(names[:num_players], owner, offsets, targets, names[num_players:], labels,
+                  roffsets=roffsets, sources=sources)
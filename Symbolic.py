@@ -0,0 +1,320 @@
+import time
+import BDD as B
+import Expressions as E
+import Fixpoint as F
+import Game as G
+from util import parse
+
+# Symbolic model checking: sets of states and the moves are BDDs over the bits of a state instead of lists of
+#  states, so models that are the product of several components (e.g. train_gate below, n trains sharing one
+#  controller) are checked without enumerating their states. A Model has named fields, unsigned ints of a
+#  fixed number of bits, and every bit is a current variable with its next variable right below it, which
+#  keeps relations between the two small. It holds
+#   states      the states of the model, assignments outside of it are ignored
+#   trans       the moves, over the current and the next variables
+#   owners      player -> the states that player controls (as Game, a state has at most 1)
+#   props       proposition -> the states where it holds
+#  The labeling is the one of Fixpoint with BDDs in place of the 0/1 bytes:
+#       Pre_A(Z)        =  (A ^ Ex'. T ^ Z') V (~A ^ ~Ex'. T ^ states' ^ ~Z')
+#       {A}@ phi        =  Pre_A(phi)
+#       {A}[] phi       =  nu Z. phi ^ Pre_A(Z)
+#       {A} phi U psi   =  mu Z. psi V (phi ^ Pre_A(Z))
+#  where the primed sets are renamed to the next variables. Every iteration ends in a checkpoint of the BDD,
+#  which collects garbage once there is enough of it
+
+
+class Model:
+
+    def __init__(self, fields, bdd=None):
+        # fields maps each name to its number of bits
+        self.bdd = B.BDD() if bdd is None else bdd
+        self.fields = {}  # name -> levels of the current variables, most significant bit first
+        for name, width in fields.items():
+            levels = []
+            for _ in range(width):
+                levels.append(self.bdd.add_var())
+                self.bdd.add_var()  # its next variable
+            self.fields[name] = levels
+        self.current = [level for levels in self.fields.values() for level in levels]
+        self.primed = self.bdd.cube([level + 1 for level in self.current])  # quantified in pre and image
+        self.unprimed = self.bdd.cube(self.current)
+        self.states = B.TRUE
+        self.trans = B.FALSE
+        self.owners = {}
+        self.props = {}
+
+    def __repr__(self):
+        return repr(f'Model | Fields: {list(self.fields)} | States: {self.count(self.states)} | '
+                    f'Players: {list(self.owners)} | Props: {list(self.props)}')
+
+    def roots(self):
+        # every node the model holds, kept by garbage collection
+        return [self.primed, self.unprimed, self.states, self.trans, *self.owners.values(), *self.props.values()]
+
+    def checkpoint(self, held=()):
+        self.bdd.checkpoint(self.roots() + list(held))
+
+    # Building
+
+    def value(self, name, value, next=False):
+        # the assignments where field name is value
+        bdd = self.bdd
+        u = B.TRUE
+        levels = self.fields[name]
+        if not 0 <= value < 1 << len(levels):
+            raise ValueError(f'{value} does not fit in the {len(levels)} bits of {name}')
+        for k, level in enumerate(reversed(levels)):
+            level += next
+            u = bdd.mk(level, u, B.FALSE) if value >> k & 1 == 0 else bdd.mk(level, B.FALSE, u)
+        return u
+
+    def unchanged(self, names):
+        # the moves that keep the fields in names as they are
+        bdd = self.bdd
+        u = B.TRUE
+        for level in sorted((level for name in names for level in self.fields[name]), reverse=True):
+            u = bdd.mk(level, bdd.mk(level + 1, u, B.FALSE), bdd.mk(level + 1, B.FALSE, u))
+        return u
+
+    def prime(self, u):
+        return self.bdd.rename(u, 1)
+
+    def unprime(self, u):
+        return self.bdd.rename(u, -1)
+
+    def image(self, u):
+        # the successors of the states in u
+        return self.unprime(self.bdd.and_exists(u, self.trans, self.unprimed))
+
+    def reachable(self, init):
+        # the states reachable from init, also made the states of the model
+        bdd = self.bdd
+        seen = frontier = init
+        while frontier != B.FALSE:
+            frontier = bdd.conj(self.image(frontier), bdd.neg(seen))
+            seen = bdd.disj(seen, frontier)
+            self.checkpoint((seen, frontier))
+        self.states = seen
+        return seen
+
+    # Checking
+
+    def coalition(self, players):
+        # the states controlled by a player in players
+        u = B.FALSE
+        for p, states in self.owners.items():
+            if p in players:
+                u = self.bdd.disj(u, states)
+        return u
+
+    def pre(self, z, exists):
+        # coalition predecessor of z: states in exists need some successor in z, the others all of them
+        bdd = self.bdd
+        z = self.prime(z)
+        some = bdd.and_exists(self.trans, z, self.primed)
+        escape = bdd.and_exists(self.trans, bdd.conj(self.prime(self.states), bdd.neg(z)), self.primed)
+        return bdd.conj(self.states, bdd.disj(bdd.conj(exists, some), bdd.conj(bdd.neg(exists), bdd.neg(escape))))
+
+    def count(self, u):
+        # how many states of the model are in u
+        return self.bdd.count(self.bdd.conj(u, self.states), self.current)
+
+    def holds(self, u, values):
+        # whether the state with the given field values (name -> int) is in u
+        bits = {}
+        for name, levels in self.fields.items():
+            for k, level in enumerate(reversed(levels)):
+                bits[level] = values[name] >> k & 1
+        return self.bdd.evaluate(u, bits.__getitem__)
+
+    def members(self, u):
+        # yields the states of the model in u as dicts of field values
+        widths = [(name, len(levels)) for name, levels in self.fields.items()]
+        for key in self.bdd.assignments(self.bdd.conj(u, self.states), self.current):
+            out = {}
+            for name, width in reversed(widths):
+                out[name] = key & (1 << width) - 1
+                key >>= width
+            yield dict(reversed(out.items()))
+
+
+def from_game(game):
+    # the Model of a compiled Game, one field 'state' with the index of the state
+    n = game.size
+    width = max(1, (n - 1).bit_length())
+    model = Model({'state': width})
+    bdd = model.bdd
+    levels = model.fields['state']
+    model.states = bdd.values(levels, range(n))
+    pairs = []  # the bits of (i, j) interleaved, like the variables
+    for i in range(n):
+        for j in dict.fromkeys(game.successors(i)):
+            key = 0
+            for k in range(width - 1, -1, -1):
+                key = key << 2 | (i >> k & 1) << 1 | j >> k & 1
+            pairs.append(key)
+    pairs.sort()
+    model.trans = bdd.values([level + d for level in levels for d in (0, 1)], pairs)
+    for k, p in enumerate(game.players):
+        model.owners[p] = bdd.values(levels, [i for i in range(n) if game.owner[i] == k])
+    for p in game.props:
+        row = game.prop(p)
+        model.props[p] = bdd.values(levels, [i for i in range(n) if row[i]])
+    return model
+
+
+def compute(exp, model, memo, profile=None):
+    # the states where exp holds from those of its children, which must already be in memo
+    bdd = model.bdd
+    if type(exp.op) is int:
+        if exp.op == E.CONST:
+            return model.states if exp.subexp1 else B.FALSE
+        elif exp.op == E.PROP:
+            return bdd.conj(model.states, model.props.get(exp.subexp1, B.FALSE))
+        elif exp.op == E.NEG:
+            return bdd.conj(model.states, bdd.neg(memo[exp.subexp1]))
+        a, b = memo[exp.subexp1], memo[exp.subexp2]
+        if exp.op == E.DISJ:
+            return bdd.disj(a, b)
+        elif exp.op == E.IMPL:
+            return bdd.conj(model.states, bdd.disj(bdd.neg(a), b))
+        else:  # exp.op == CONJ
+            return bdd.conj(a, b)
+    op, players = exp.op[E.OP], exp.op[E.PLAYERS]
+    if op == E.AVOID or op == E.DIAMOND:  # same expansions as Exp.check
+        return memo[exp.expand()]
+    ours = model.coalition(players)
+    phi = memo[exp.subexp1]
+    if op == E.CIRCLE:
+        return model.pre(phi, ours)
+    elif op == E.SQUARE:
+        z, last = phi, None
+        while z != last:
+            last = z
+            z = bdd.conj(phi, model.pre(z, ours))
+            model.checkpoint([*memo.values(), ours, last, z])
+            if profile is not None:
+                profile.row(exp)[E.ITERATIONS] += 1
+        return z
+    elif op == E.UNTIL:
+        psi = memo[exp.subexp2]
+        z, last = psi, None
+        while z != last:
+            last = z
+            z = bdd.disj(psi, bdd.conj(phi, model.pre(z, ours)))
+            model.checkpoint([*memo.values(), ours, last, z])
+            if profile is not None:
+                profile.row(exp)[E.ITERATIONS] += 1
+        return z
+    raise ValueError(f'Unknown operator: {exp.op}')
+
+
+def evaluate(exp, model, memo, profile=None):
+    # the states of every subformula of exp, children first on an explicit stack like Fixpoint.evaluate
+    #  with a profile, the iterations of [] and U are the rounds until their fixpoint
+    stack = [exp]
+    while stack:
+        node = stack[-1]
+        if node in memo:
+            stack.pop()
+            continue
+        todo = [x for x in F.children(node) if x not in memo]
+        if todo:
+            stack.extend(todo)
+            continue
+        stack.pop()
+        if profile is None:
+            memo[node] = compute(node, model, memo)
+        else:
+            start = time.perf_counter()
+            profile.row(node)[E.CALLS] += 1
+            memo[node] = compute(node, model, memo, profile)
+            profile.row(node)[E.SECONDS] += time.perf_counter() - start
+    return memo[exp]
+
+
+def sat(exp, model, profile=None):
+    # the states of model (a Model) where exp holds, as a BDD of the model; exp is checked in its normal form
+    #  The result is referenced (BDD.ref) so the checkpoints of later checks on the model keep it, call
+    #  model.bdd.deref on it once it isn't needed anymore
+    if type(exp) is str:
+        exp = parse(exp)
+    if profile is not None:
+        profile.checks += 1
+        begin = time.perf_counter()
+    out = evaluate(exp.normalize(), model, {}, profile)
+    if profile is not None:
+        profile.seconds += time.perf_counter() - begin
+    return model.bdd.ref(out)
+
+
+def is_valid(exp, model, profile=None):
+    # whether exp holds in every state of model
+    u = sat(exp, model, profile)
+    out = model.bdd.conj(model.states, model.bdd.neg(u)) == B.FALSE
+    model.bdd.deref(u)
+    return out
+
+
+def label(exp, model, profile=None):
+    # like Fixpoint.label: for each state whether exp holds in it, model is a compiled Game or a list of States
+    game = model if isinstance(model, G.Game) else G.compile(model)
+    out = [False] * game.size
+    symbolic = from_game(game)
+    for values in symbolic.members(sat(exp, symbolic, profile)):  # the model goes with it, no deref needed
+        out[values['state']] = True
+    return out if isinstance(model, G.Game) else out[:len(model)]
+
+
+# Train-Gate with n trains and one controller, the same game as bench.generators.train_gate: the field turn
+#  says whose turn it is (train 0 to n - 1, then the controller at n) and field t, t1, ... the position of
+#  each train (OUT, REQ, GRANT or IN). The states are those reachable from every train OUT on the turn of t
+OUT, REQ, GRANT, IN = range(4)
+
+
+def train_gate(n):
+    names = ['t'] + [f't{i}' for i in range(1, n)]
+    model = Model({'turn': n.bit_length(), **{name: 2 for name in names}})
+    bdd = model.bdd
+
+    def at(name, pos, next=False):
+        return model.value(name, pos, next)
+
+    def one_of(name, positions, next=False):
+        u = B.FALSE
+        for pos in positions:
+            u = bdd.disj(u, at(name, pos, next))
+        return u
+
+    trans = B.FALSE
+    for k, name in enumerate(names):
+        # train k: OUT may request, GRANT may enter or stay out, the others stay where they are
+        move = bdd.disj(bdd.conj(at(name, OUT), one_of(name, (OUT, REQ), True)),
+                        bdd.conj(at(name, GRANT), one_of(name, (OUT, IN), True)))
+        move = bdd.disj(move, bdd.conj(one_of(name, (REQ, IN)), model.unchanged([name])))
+        turn = bdd.conj(model.value('turn', k), model.value('turn', k + 1, True))
+        trans = bdd.disj(trans, bdd.conj(turn, bdd.conj(move, model.unchanged([x for x in names if x != name]))))
+    # the controller: nothing, grant a request while the gate is free, or send the train in the gate out
+    free = B.TRUE
+    for name in names:
+        free = bdd.conj(free, one_of(name, (OUT, REQ)))
+    moves = model.unchanged(names)
+    for name in names:
+        others = model.unchanged([x for x in names if x != name])
+        grant = bdd.conj(bdd.conj(free, at(name, REQ)), at(name, GRANT, True))
+        leave = bdd.conj(at(name, IN), at(name, OUT, True))
+        moves = bdd.disj(moves, bdd.conj(bdd.disj(grant, leave), others))
+    turn = bdd.conj(model.value('turn', n), model.value('turn', 0, True))
+    model.trans = bdd.disj(trans, bdd.conj(turn, moves))
+
+    init = model.value('turn', 0)
+    for name in names:
+        init = bdd.conj(init, at(name, OUT))
+    model.reachable(init)
+    for k, name in enumerate(names + ['c']):
+        model.owners[name] = model.value('turn', k)
+    for name in names:
+        suffix = name[1:]
+        for p, positions in (('oog', (OUT, REQ, GRANT)), ('req', (REQ,)), ('grant', (GRANT,)), ('ig', (IN,))):
+            model.props[p + suffix] = one_of(name, positions)
+    return model
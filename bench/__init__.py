@@ -0,0 +1,3 @@
+# Benchmarks: synthetic model generators, formula families and a runner, see bench/run.py
+from bench.generators import chain, grid, clique, random_game, train_gate, states, game
+from bench.formulas import nested_square, nested_until, alternating, distinct
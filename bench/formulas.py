@@ -0,0 +1,73 @@
+import random
+
+# Formula families of growing nesting depth, as strings so parsing is measured too
+
+
+def nested_square(depth):
+    # {a}[]({b}[](...(p)))
+    out = 'p'
+    for d in range(depth):
+        out = f'{{{"ab"[d % 2]}}}[]({out})'
+    return out
+
+
+def nested_until(depth):
+    # {a}(p) U ({b}(p) U (...(q)))
+    out = 'q'
+    for d in range(depth):
+        out = f'{{{"ab"[d % 2]}}}(p) U ({out})'
+    return out
+
+
+def alternating(depth):
+    # cycles through every operator: ~, ^, @, <>, [], V, ->
+    out = 'p'
+    for d in range(depth):
+        k = d % 7
+        if k == 0:
+            out = f'~({out})'
+        elif k == 1:
+            out = f'(q ^ {out})'
+        elif k == 2:
+            out = f'{{a}}@({out})'
+        elif k == 3:
+            out = f'{{a,b}}<>({out})'
+        elif k == 4:
+            out = f'{{0}}[]({out} V q)'
+        elif k == 5:
+            out = f'(p V {out})'
+        else:
+            out = f'(q -> {out})'
+    return out
+
+
+def train_gate(depth):
+    # the TrainGate examples, depth picks how many of them are conjoined
+    examples = ['{0}[]((oog ^ ~grant) -> {c,t}[](oog))',
+                '{0}[](oog -> {c,t}<>(ig))',
+                '{0}[](oog -> {t}<>(req ^ ({c}<>(grant)) ^ ({c}[](~grant))))',
+                '{0}[](ig -> {c}@(oog))']
+    out = examples[0]
+    for d in range(1, depth):
+        out = f'({out} ^ {examples[d % len(examples)]})'
+    return out
+
+
+def distinct(count, seed=0):
+    # count specs of every family and depth 1 to 8, no two alike (the propositions are numbered), so
+    #  parsing them can't hit util.parse's cache or reuse interned nodes of an earlier spec
+    r = random.Random(seed)
+    families = [nested_square, nested_until, alternating, train_gate]
+    out = []
+    for k in range(count):
+        text = families[k % len(families)](r.randint(1, 8))
+        out.append(text.replace('p', f'p{k}').replace('oog', f'oog{k}'))
+    return out
+
+
+FAMILIES = {
+    'square': nested_square,
+    'until': nested_until,
+    'alternating': alternating,
+    'traingate': train_gate,
+}
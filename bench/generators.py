@@ -0,0 +1,120 @@
+import random
+import States as S
+import Game as G
+
+# Scalable synthetic models. Every generator returns (owners, edges, labels), the input of Game.build:
+#  owners[i] is the player controlling state i, edges a list of (i, j) pairs and labels maps each
+#  proposition to its states. states() turns that into State objects for Exp.check
+
+
+def states(owners, edges, labels):
+    out = [S.State([], p) for p in owners]
+    for p, members in labels.items():
+        for i in members:
+            out[i].add_prop(p)
+    succ = [[] for _ in out]
+    for i, j in edges:
+        succ[i].append(out[j])
+    for s, targets in zip(out, succ):
+        s.connect(targets)
+    return out
+
+
+def game(owners, edges, labels):
+    return G.build(owners, edges, labels)
+
+
+def chain(n, players=('a', 'b')):
+    # 0 -> 1 -> ... -> n-1, the last state loops and is the only q state, every state is p
+    owners = [players[i % len(players)] for i in range(n)]
+    edges = [(i, i + 1) for i in range(n - 1)] + [(n - 1, n - 1)]
+    return owners, edges, {'p': range(n), 'q': [n - 1]}
+
+
+def grid(k, players=('a', 'b')):
+    # k x k grid moving right or down, the bottom right corner loops and is q, the diagonal is not p
+    owners, edges = [], []
+    for r in range(k):
+        for c in range(k):
+            i = r * k + c
+            owners.append(players[(r + c) % len(players)])
+            if c + 1 < k:
+                edges.append((i, i + 1))
+            if r + 1 < k:
+                edges.append((i, i + k))
+    edges.append((k * k - 1, k * k - 1))
+    return owners, edges, {'p': [i for i in range(k * k) if i // k != i % k or i == k * k - 1], 'q': [k * k - 1]}
+
+
+def clique(n, players=('a', 'b')):
+    owners = [players[i % len(players)] for i in range(n)]
+    edges = [(i, j) for i in range(n) for j in range(n)]
+    return owners, edges, {'p': [i for i in range(n) if i % 3], 'q': [0]}
+
+
+def random_game(n, degree=3, players=('a', 'b'), props=('p', 'q'), density=0.5, seed=0):
+    # random turn-based game graph, every state has between 1 and 2 * degree - 1 successors
+    r = random.Random(seed)
+    owners = [r.choice(players) for _ in range(n)]
+    edges = [(i, r.randrange(n)) for i in range(n) for _ in range(r.randint(1, 2 * degree - 1))]
+    labels = {p: [i for i in range(n) if r.random() < density] for p in props}
+    return owners, edges, labels
+
+
+# Train-Gate with n trains and one controller. A state is the position of every train (OUT, REQ, GRANT
+#  or IN) and whose turn it is; the turn goes t, t1, ..., c and around again. On its turn a train out
+#  of the gate may request, and a train with a grant may enter or stay out. The controller may grant
+#  one request while the gate is free, or send the train in the gate out. Train 0 is player t with
+#  the props oog, req, grant, ig of TrainGate, so its examples hold over any number of trains; train
+#  i > 0 is player t<i> with props oog<i>, req<i>, grant<i>, ig<i>
+OUT, REQ, GRANT, IN = range(4)
+
+
+def train_gate(n):
+    names = ['t'] + [f't{i}' for i in range(1, n)]
+    turns = names + ['c']
+
+    def moves(trains, turn):
+        if turn < n:  # a train
+            pos = trains[turn]
+            options = {OUT: (OUT, REQ), GRANT: (OUT, IN)}.get(pos, (pos,))
+            return [trains[:turn] + (p,) + trains[turn + 1:] for p in options]
+        out = [trains]
+        busy = [i for i, p in enumerate(trains) if p == GRANT or p == IN]
+        for i, p in enumerate(trains):
+            if p == REQ and not busy:
+                out.append(trains[:i] + (GRANT,) + trains[i + 1:])
+            elif p == IN:
+                out.append(trains[:i] + (OUT,) + trains[i + 1:])
+        return out
+
+    start = ((OUT,) * n, 0)
+    ids = {start: 0}
+    order = [start]
+    edges = []
+    k = 0
+    while k < len(order):
+        trains, turn = order[k]
+        for nxt in moves(trains, turn):
+            key = (nxt, (turn + 1) % len(turns))
+            if key not in ids:
+                ids[key] = len(order)
+                order.append(key)
+            edges.append((k, ids[key]))
+        k += 1
+
+    labels = {}
+    for i, (trains, turn) in enumerate(order):
+        for t, pos in enumerate(trains):
+            suffix = '' if t == 0 else str(t)
+            for p in (('oog',) if pos != IN else ()) + ({REQ: ('req',), GRANT: ('grant',), IN: ('ig',)}.get(pos, ())):
+                labels.setdefault(p + suffix, []).append(i)
+    return [turns[turn] for _, turn in order], edges, labels
+
+
+MODELS = {
+    'chain': chain,
+    'grid': lambda n: grid(max(1, int(round(n ** 0.5)))),
+    'clique': lambda n: clique(max(1, int(round(n ** 0.5)))),
+    'random': random_game,
+}
@@ -0,0 +1,103 @@
+import argparse
+import contextlib
+import io
+import json
+import platform
+import sys
+import time
+import util
+from bench import formulas, generators
+
+with contextlib.redirect_stdout(io.StringIO()):  # ATL prints its walkthrough example on import
+    import ATL
+
+# Times parse, Exp.check, test and is_valid over growing models and formulas, one JSON object per line:
+#   {"model", "size", "states", "edges", "family", "depth", "engine", "op", "seconds", "result"}
+#  and first the cold parse of --specs distinct specs (formulas.distinct), op "parse_cold" with the number
+#  of specs as result
+# seconds is the best of --repeat runs. Runs of the dfs engine are skipped on models with more states
+#  than --dfs-limit, its search can be exponential
+#
+#   python -m bench.run --models chain grid --sizes 1000 10000 --depths 1 2 4 --out bench_output.txt
+
+
+def best(fn, repeat):
+    seconds = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        seconds = min(seconds, time.perf_counter() - start)
+    return seconds, out
+
+
+def workloads(args):
+    # (model name, size, generator output, families to run on it)
+    for name in args.models:
+        if name == 'traingate':
+            for n in args.trains:
+                yield name, n, generators.train_gate(n), ['traingate']
+        else:
+            for n in args.sizes:
+                yield name, n, generators.MODELS[name](n), [f for f in args.families if f != 'traingate']
+
+
+def run(args, emit):
+    if args.specs:
+        specs = formulas.distinct(args.specs)
+        seconds, _ = best(lambda: [util.parse_text(text) for text in specs], args.repeat)
+        emit({'family': 'distinct', 'engine': None, 'op': 'parse_cold', 'seconds': seconds, 'result': len(specs)})
+    for model, size, spec, families in workloads(args):
+        owners, edges, labels = spec
+        states = generators.states(owners, edges, labels)
+        game = generators.game(owners, edges, labels)
+        base = {'model': model, 'size': size, 'states': len(owners), 'edges': len(edges)}
+        for family in families:
+            for depth in args.depths:
+                text = formulas.FAMILIES[family](depth)
+                row = dict(base, family=family, depth=depth)
+                seconds, exp = best(lambda: util.parse_text(text), args.repeat)
+                emit(dict(row, engine=None, op='parse', seconds=seconds, result=len(text)))
+                for engine in args.engines:
+                    if engine == 'dfs' and len(owners) > args.dfs_limit:
+                        continue
+                    model_states = states if engine == 'dfs' else game
+                    if engine == 'dfs':
+                        seconds, out = best(lambda: exp.check(states[0]), args.repeat)
+                        emit(dict(row, engine=engine, op='check', seconds=seconds, result=out))
+                    seconds, out = best(lambda: ATL.test(exp, model_states, engine), args.repeat)
+                    emit(dict(row, engine=engine, op='test', seconds=seconds, result=sum(out)))
+                    seconds, out = best(lambda: ATL.is_valid(exp, model_states, engine), args.repeat)
+                    emit(dict(row, engine=engine, op='is_valid', seconds=seconds, result=out))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='ATL model checking benchmarks')
+    parser.add_argument('--models', nargs='+', default=['chain', 'grid', 'random', 'traingate'],
+                        choices=sorted(generators.MODELS) + ['traingate'])
+    parser.add_argument('--sizes', nargs='+', type=int, default=[100, 1000, 10000])
+    parser.add_argument('--trains', nargs='+', type=int, default=[1, 2, 3, 4])
+    parser.add_argument('--families', nargs='+', default=sorted(formulas.FAMILIES), choices=sorted(formulas.FAMILIES))
+    parser.add_argument('--depths', nargs='+', type=int, default=[1, 2, 4, 8])
+    parser.add_argument('--engines', nargs='+', default=['dfs', 'fixpoint'], choices=['dfs', 'fixpoint', 'symbolic', 'parallel'])
+    parser.add_argument('--dfs-limit', type=int, default=100)
+    parser.add_argument('--specs', type=int, default=20000, help='distinct specs for the cold parse, 0 skips it')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--out', help='file for the results, default stdout')
+    args = parser.parse_args(argv)
+
+    out = open(args.out, 'w') if args.out else sys.stdout
+    try:
+        out.write(json.dumps({'python': platform.python_version(), 'machine': platform.machine(),
+                              'args': vars(args)}) + '\n')
+
+        def emit(record):
+            out.write(json.dumps(record) + '\n')
+            out.flush()
+        run(args, emit)
+    finally:
+        if args.out:
+            out.close()
+
+
+if __name__ == '__main__':
+    main()
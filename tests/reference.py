@@ -0,0 +1,141 @@
+import random
+import Expressions as E
+import States as S
+from Expressions import Exp
+
+# Random models and formulas for the cross-checks, and a reference labeling that follows the definitions
+#  with no shortcuts: Pre_A straight from the successors and every fixpoint iterated from its start until it
+#  stops changing
+
+
+def random_states(seed, n=None, players='ab', props='pq'):
+    # (States, the Random that made them) with n states (random when None), some of them deadlocked
+    r = random.Random(seed)
+    n = n or r.randint(3, 20)
+    states = [S.State([p for p in props if r.random() < .5], r.choice(players)) for _ in range(n)]
+    for s in states:
+        for t in r.sample(states, r.randint(0, 3)):
+            s.connect(t)
+    return states, r
+
+
+def random_formula(r, depth, players='ab', props='pq'):
+    if depth == 0:
+        return Exp(r.choice(props))
+    coalition = r.choice([[]] + [[p] for p in players] + [list(players)])
+    kind = r.randrange(8)
+    if kind == 0:
+        return Exp(random_formula(r, depth - 1), op=E.NEG)
+    if kind == 1:
+        return Exp(random_formula(r, depth - 1), random_formula(r, depth - 1), r.choice([E.CONJ, E.DISJ, E.IMPL]))
+    if kind == 2:
+        return Exp(random_formula(r, depth - 1), op=(E.CIRCLE, coalition))
+    if kind == 3:
+        return Exp(random_formula(r, depth - 1), op=(E.SQUARE, coalition))
+    if kind == 4:
+        return Exp(random_formula(r, depth - 1), op=(E.DIAMOND, coalition))
+    if kind == 5:
+        return Exp(r.choice([True, False]), op=E.CONST)
+    return Exp(random_formula(r, depth - 1), random_formula(r, depth - 1), op=(E.UNTIL, coalition))
+
+
+def label(exp, states):
+    # whether exp holds in each of states, which must hold every state they reach
+    index = {s: i for i, s in enumerate(states)}
+    succ = [[index[t] for t in s.connections or ()] for s in states]
+
+    def pre(z, players):
+        return [any(z[j] for j in succ[i]) if s.player in players else all(z[j] for j in succ[i])
+                for i, s in enumerate(states)]
+
+    return fixpoints(exp, [s.has for s in states], pre)
+
+
+def fixpoints(exp, has, pre):
+    # the labels of exp over the states with has[i](p) for the propositions of state i and pre(z, players)
+    #  the coalition predecessor of the labels z
+    n = len(has)
+
+    def go(e):
+        op = e.op
+        if type(op) is int:
+            if op == E.CONST:
+                return [bool(e.subexp1)] * n
+            if op == E.PROP:
+                return [h(e.subexp1) for h in has]
+            if op == E.NEG:
+                return [not x for x in go(e.subexp1)]
+            a, b = go(e.subexp1), go(e.subexp2)
+            if op == E.CONJ:
+                return [x and y for x, y in zip(a, b)]
+            if op == E.DISJ:
+                return [x or y for x, y in zip(a, b)]
+            return [not x or y for x, y in zip(a, b)]
+        kind, players = op
+        if kind in (E.AVOID, E.DIAMOND):
+            return go(e.expand())
+        phi = go(e.subexp1)
+        if kind == E.CIRCLE:
+            return pre(phi, players)
+        if kind == E.SQUARE:
+            z = phi
+            while True:
+                nz = [x and y for x, y in zip(phi, pre(z, players))]
+                if nz == z:
+                    return z
+                z = nz
+        psi = go(e.subexp2)
+        z = [False] * n
+        while True:
+            nz = [y or (x and w) for x, y, w in zip(phi, psi, pre(z, players))]
+            if nz == z:
+                return z
+            z = nz
+
+    return go(exp)
+
+
+def baseline(exp, states):
+    # the results of the recursive Exp.check that came before the work-stack one, for formulas util.parse
+    #  makes (no AVOID or DIAMOND nodes): [] looks at phi from the successors on, U never looks at phi, and
+    #  the states on the path of every search are marked in one set shared by all of them (State.color)
+    green = set()
+
+    def check(e, s):
+        op = e.op
+        if type(op) is int:
+            if op == E.CONST:
+                return e.subexp1
+            if op == E.PROP:
+                return s.has(e.subexp1)
+            if op == E.NEG:
+                return not check(e.subexp1, s)
+            if op == E.DISJ:
+                return check(e.subexp1, s) or check(e.subexp2, s)
+            if op == E.IMPL:
+                return not check(e.subexp1, s) or check(e.subexp2, s)
+            return check(e.subexp1, s) and check(e.subexp2, s)
+        kind, players = op
+        successors = s.connections or ()
+        if kind == E.CIRCLE:
+            nearest = [check(e.subexp1, t) for t in successors]
+            return any(nearest) if s.player in players else all(nearest)
+        if kind == E.SQUARE:
+            if s in green:
+                return True
+            green.add(s)
+            nearest = [check(e, t) and check(e.subexp1, t) for t in successors]
+            green.discard(s)
+            return any(nearest) if s.player in players else all(nearest)
+        if kind == E.UNTIL:
+            if check(e.subexp2, s):
+                return True
+            if s in green:
+                return False
+            green.add(s)
+            nearest = [check(e, t) for t in successors]
+            green.discard(s)
+            return any(nearest) if s.player in players else all(nearest)
+        raise ValueError(f'No baseline result for {e}')
+
+    return [check(exp, s) for s in states]
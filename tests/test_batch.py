@@ -0,0 +1,17 @@
+import Batch
+from reference import label, random_formula, random_states
+
+
+def test_check_many_agrees_with_reference():
+    for seed in range(20):
+        states, r = random_states(seed, 25)
+        formulas = [random_formula(r, 3) for _ in range(4)]
+        expected = [label(exp, states) for exp in formulas]
+        assert Batch.check_many(formulas, states, workers=1) == expected
+        assert Batch.check_many(formulas, states, workers=3, processes=False) == expected
+        assert Batch.check_many(formulas, states, workers=2, processes=False, engine='fixpoint') == expected
+    states, r = random_states(99, 25)
+    formulas = [random_formula(r, 3) for _ in range(4)]
+    expected = [label(exp, states) for exp in formulas]
+    assert Batch.check_many(formulas, states, workers=2) == expected
+    assert Batch.check_many(formulas, states, workers=2, engine='fixpoint') == expected
@@ -0,0 +1,48 @@
+import itertools
+import Concurrent as K
+import Game as G
+from reference import fixpoints, label, random_formula, random_states
+
+
+def test_turn_based_games_agree_with_reference():
+    for seed in range(200):
+        states, r = random_states(seed)
+        exp = random_formula(r, 4)
+        structure = K.from_game(G.compile(states))
+        assert K.label(exp, structure)[:len(states)] == label(exp, states), (seed, exp)
+
+
+def test_agrees_with_joint_move_enumeration():
+    # Pre_A straight from the definition: a move of the coalition whose every answer of the others ends in Z
+    agents = ['a', 'b', 'c']
+    for seed in range(200):
+        _, r = random_states(seed)
+        n = r.randint(2, 12)
+        actions = [{name: r.choice([0, 1, 1, 2, 3]) for name in agents} for _ in range(n)]
+        moves = {}
+
+        def delta(i, joint):
+            return moves.setdefault((i, joint), r.randrange(n))
+
+        labels = {p: [i for i in range(n) if r.random() < .5] for p in 'pq'}
+        structure = K.build(agents, actions, delta, labels)
+
+        def pre(z, players):
+            out = []
+            for i in range(n):
+                counts = [actions[i][name] for name in agents]
+                ours = [k for k, name in enumerate(agents) if name in players]
+                theirs = [k for k, name in enumerate(agents) if name not in players]
+                wins = False
+                for mine in itertools.product(*(range(counts[k]) for k in ours)):
+                    joint = dict(zip(ours, mine))
+                    if all(z[moves[i, tuple({**joint, **dict(zip(theirs, other))}[k] for k in range(3))]]
+                           for other in itertools.product(*(range(counts[k]) for k in theirs))):
+                        wins = True
+                        break
+                out.append(wins)
+            return out
+
+        has = [lambda p, i=i: i in labels[p] for i in range(n)]
+        exp = random_formula(r, 4, players='abc')
+        assert K.label(exp, structure) == fixpoints(exp, has, pre), (seed, exp)
@@ -0,0 +1,76 @@
+import contextlib
+import io
+import Counterexample as C
+import Expressions as E
+import Fixpoint as F
+import Game as G
+from reference import random_formula, random_states
+from util import TrainGate, parse
+
+with contextlib.redirect_stdout(io.StringIO()):  # ATL prints its walkthrough example on import
+    import ATL
+
+
+def check_item(item, game):
+    # the play of one line of a counterexample is a play of game that shows what the line claims
+    node, holds, path = item.exp, item.holds, item.indices
+    assert bool(F.label(node, game)[path[0]]) == holds
+    for a, b in zip(path, path[1:]):
+        assert b in game.successors(a)
+    if item.loop is not None:
+        assert path[item.loop] in game.successors(path[-1])
+    if type(node.op) is int:
+        assert len(path) == 1
+        return
+    kind, players = node.op
+    phi = F.label(node.subexp1, game)
+    ours = game.coalition(players)
+    if kind == E.CIRCLE:
+        assert len(path) == 2 or not game.successors(path[0]) and ours[path[0]] != holds
+        if len(path) == 2:
+            assert phi[path[1]] == holds
+    elif kind == E.SQUARE:
+        inner = path if holds or item.cause is None else path[:-1]
+        assert all(phi[j] for j in inner)
+        if holds and item.loop is None:
+            assert not game.successors(path[-1]) and not ours[path[-1]]
+    else:
+        psi = F.label(node.subexp2, game)
+        assert all(phi[j] and not psi[j] for j in path[:-1])
+        if holds and item.loop is None and not game.successors(path[-1]):
+            assert psi[path[-1]] or not ours[path[-1]]
+        elif holds:
+            assert psi[path[-1]]
+    if item.cause is not None:
+        assert item.cause.indices[0] == path[-1]
+
+
+def test_random_counterexamples_and_witnesses():
+    for seed in range(300):
+        states, r = random_states(seed)
+        exp = random_formula(r, 4)
+        game = G.compile(states)
+        labels = F.label(exp, states)
+        found = list(ATL.violations(exp, states, 'fixpoint'))
+        assert len(found) == labels.count(False)
+        for cx in found:
+            item = cx
+            while item is not None:
+                check_item(item, game)
+                item = item.cause
+
+
+def test_negated_path_formula_shows_the_winning_play():
+    tg = TrainGate()
+    cx = ATL.counterexample('~{c,t}<>(ig)', tg.states)
+    assert cx.holds and len(cx.indices) == 4
+    assert repr(cx).splitlines()[0].endswith('#3{ig}')
+    assert cx.cause.holds and cx.cause.exp == parse('ig')
+
+
+def test_labels_memo_keeps_only_labels():
+    tg = TrainGate()
+    game = G.compile(tg.states)
+    memo, ranks = {}, {}
+    C.find(parse('{c}[](oog)'), game, 2, memo, ranks)
+    assert all(isinstance(k, E.Exp) for k in memo) and ranks
@@ -0,0 +1,73 @@
+import Expressions as E
+import States as S
+from Expressions import Exp
+from reference import baseline, label, random_formula, random_states
+from util import TrainGate
+
+
+def test_invalidate_state_drops_what_depends_on_it():
+    for seed in range(200):
+        states, r = random_states(seed)
+        exp = random_formula(r, 3)
+        cache = E.EvalCache()
+        assert [exp.check(s, cache) for s in states] == label(exp, states)
+        s = r.choice(states)  # one edit, then only the entries it can change go
+        if r.random() < .5:
+            s.props = [p for p in 'pq' if r.random() < .5]
+        else:
+            s.connect(r.choice(states))
+        cache.invalidate(state=s)
+        assert [exp.check(s, cache) for s in states] == label(exp, states)
+
+
+def test_invalidate_state_keeps_what_cannot_reach_it():
+    states, _ = random_states(0, 3)
+    a, b, c = states
+    for s in states:
+        s.connections = []
+    a.connect(b)
+    cache = E.EvalCache()
+    exp = E.Exp(E.Exp('p'), op=(E.CIRCLE, ['a', 'b']))
+    for s in states:
+        exp.check(s, cache)
+    cache.invalidate(state=b)
+    assert cache.get(exp.normalize(), c) is not None
+    assert cache.get(exp.normalize(), a) is None and cache.get(exp.normalize(), b) is None
+
+
+def test_check_agrees_with_reference():
+    for seed in range(300):
+        states, r = random_states(seed)
+        exp = random_formula(r, 4)
+        components = S.Components()
+        assert [exp.check(s, None, None, components) for s in states] == label(exp, states), (seed, exp)
+
+
+def test_normalize_keeps_labels():
+    for seed in range(300):
+        states, r = random_states(seed)
+        exp = random_formula(r, 4)
+        assert label(exp.normalize(), states) == label(exp, states), (seed, exp)
+
+
+def test_check_semantics_against_the_recursive_check():
+    # Exp.check labels like Fixpoint since the work-stack rewrite; the recursive check before it
+    #  (reference.baseline) differed in three ways, pinned here
+    tg = TrainGate()
+    old = [baseline(ex, tg.states) for ex in tg.examples]
+    new = [[ex.check(s) for s in tg.states] for ex in tg.examples]
+    # nested searches shared their path marks: an inner <> met the states of the outer [] and failed there,
+    #  so examples 3 and 4 were refuted
+    assert old == [[True] * 4, [False] * 4, [False] * 4, [True] * 4]
+    assert new == [[True] * 4] * 4
+    for seed in range(300):
+        states, r = random_states(seed)
+        players = r.choice([[], ['a'], ['b'], ['a', 'b']])
+        phi, psi = Exp(r.choice('pq')), Exp(r.choice('pq'))
+        # {A}[] phi only looked at phi from the successors on, it was {A}@ {A}[] phi
+        square = Exp(phi, op=(E.SQUARE, players))
+        assert baseline(square, states) == label(Exp(square, op=(E.CIRCLE, players)), states)
+        # {A} phi U psi never looked at phi, it was {A} true U psi
+        until = Exp(phi, psi, op=(E.UNTIL, players))
+        assert baseline(until, states) == label(Exp(Exp(True, op=E.CONST), psi, op=(E.UNTIL, players)), states)
+        assert [until.check(s) for s in states] == label(until, states)
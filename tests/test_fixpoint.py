@@ -0,0 +1,47 @@
+import Expressions as E
+import Fixpoint as F
+import Game as G
+import States as S
+from reference import label, random_formula, random_states
+
+
+def test_agrees_with_reference():
+    for seed in range(300):
+        states, r = random_states(seed)
+        exp = random_formula(r, 4)
+        assert F.label(exp, states) == label(exp, states), (seed, exp)
+
+
+def test_strategies_win():
+    # following the coalition's moves, with every move of the others, the formula holds: checked on a copy of
+    #  the game where the coalition only has those moves and all paths are quantified
+    for seed in range(300):
+        states, r = random_states(seed)
+        exp = random_formula(r, 4)
+        labels, found = F.strategies(exp, states)
+        assert labels == label(exp, states)
+        game = G.compile(states)
+        for node, strategy in found.items():
+            kind, players = node.op
+            ours = game.coalition(players)
+            z = F.label(node, game)
+            phi = F.label(node.subexp1, game)
+            psi = F.label(node.subexp2, game) if kind == E.UNTIL else None
+            for i in range(game.size):
+                j = strategy[i]
+                if j >= 0:
+                    assert ours[i] and z[i] and j in game.successors(i)
+            copies = [S.State(['x'] * phi[i] + ['y'] * (psi is not None and psi[i])) for i in range(game.size)]
+            for i, s in enumerate(copies):
+                moves = [strategy[i]] if ours[i] and z[i] and strategy[i] >= 0 else game.successors(i)
+                for j in moves:
+                    s.connect(copies[j])
+            if kind == E.CIRCLE:
+                forced = E.Exp(E.Exp('x'), op=(E.CIRCLE, []))
+            elif kind == E.SQUARE:
+                forced = E.Exp(E.Exp('x'), op=(E.SQUARE, []))
+            else:
+                forced = E.Exp(E.Exp('x'), E.Exp('y'), op=(E.UNTIL, []))
+            forced_labels = label(forced, copies)
+            assert all(forced_labels[i] for i in range(game.size) if z[i]), (seed, node)
+
@@ -0,0 +1,19 @@
+import random
+import Game as G
+
+
+def test_pre_agrees_with_its_definition():
+    r = random.Random(0)
+    for _ in range(2000):
+        n = r.randint(0, 15)
+        edges = [(i, r.randrange(n)) for i in range(n) for _ in range(r.randint(0, 3))]
+        game = G.build([r.randint(-1, 1) for _ in range(n)], edges)
+        z = bytearray(r.randint(0, 1) for _ in range(n))
+        exists = bytearray(r.randint(0, 1) for _ in range(n))
+        expected = bytearray(any(z[j] for j in game.successors(i)) if exists[i] else
+                             all(z[j] for j in game.successors(i)) for i in range(n))
+        assert game.pre(z, exists) == expected
+        choice = [-1] * n
+        assert game.pre(z, exists, choice) == expected
+        for i in range(n):
+            assert choice[i] == (next((j for j in game.successors(i) if z[j]), -1) if exists[i] else -1)
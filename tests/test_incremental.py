@@ -0,0 +1,29 @@
+import Incremental as I
+import States as S
+from reference import label, random_formula, random_states
+
+
+def test_edits_agree_with_full_relabel():
+    for seed in range(100):
+        states, r = random_states(seed)
+        formulas = [random_formula(r, 4) for _ in range(3)]
+        model = I.Model(states)
+        for exp in formulas:
+            assert model.test(exp) == label(exp, model.states), (seed, exp)
+        for _ in range(10):
+            for _ in range(r.randint(1, 3)):
+                s, t = r.choice(model.states), r.choice(model.states)
+                edit = r.randrange(5)
+                if edit == 0:
+                    model.connect(s, t)
+                elif edit == 1 and s.connections:
+                    model.disconnect(s, r.choice(s.connections))
+                elif edit == 2:
+                    model.add_prop(s, r.choice('pq'))
+                elif edit == 3 and s.props:
+                    model.remove_prop(s, r.choice(s.props))
+                elif edit == 4:
+                    model.connect(s, S.State([p for p in 'pq' if r.random() < .5], r.choice('ab')))
+            exp = r.choice(formulas)
+            assert model.test(exp) == label(exp, model.states), (seed, exp)
+        assert all(model.test(exp) == label(exp, model.states) for exp in formulas)
@@ -0,0 +1,84 @@
+import subprocess
+import sys
+import textwrap
+import Local
+
+
+def chain_to(n, goal, prop):
+    def successors(k):
+        return [k + 1] if k < n else [k]
+
+    def labels(k):
+        return [prop] if k == goal else []
+
+    return successors, labels, lambda k: 'a'
+
+
+def test_new_proposition_in_a_fresh_process():
+    # the states name zzgoal only once the search generates them, after the formula was compiled
+    code = textwrap.dedent('''
+        import Local
+        successors = lambda k: [k + 1] if k < 10 else [k]
+        labels = lambda k: ['zzgoal'] if k == 5 else []
+        player = lambda k: 'a'
+        print(Local.check('{a}<>(zzgoal)', 0, successors, labels, player),
+              Local.check('{a}<>(zzgoal)', 0, successors, labels, player))
+    ''')
+    root = Local.__file__.rsplit('Local.py', 1)[0] or '.'
+    out = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True, check=True)
+    assert out.stdout.split() == ['True', 'True']
+
+
+def test_unbounded_successors_terminate():
+    def successors(k):
+        return [k + 1]
+
+    assert Local.check('{a}<>(zzlocal_far)', 0, successors, lambda k: ['zzlocal_far'] if k == 50 else [],
+                       lambda k: 'a')
+
+
+def test_every_state_expanded_once():
+    successors, labels, player = chain_to(2000, 2000, 'zzlocal_end')
+    calls = []
+    space = Local.Space(lambda k: calls.append(k) or successors(k), labels, player, limit=10)
+    assert space.check('{a}<>(zzlocal_end)', 0)
+    assert len(calls) == 2001
+
+
+def test_limit_bounds_live_states():
+    # a binary tree of depth 12: paths are short, so the search holds about limit states at a time
+    depth = 12
+
+    def successors(key):
+        d, i = key
+        return [(d + 1, 2 * i), (d + 1, 2 * i + 1)] if d < depth else [key]
+
+    space = Local.Space(successors, lambda k: ['p'], lambda k: 'a', limit=50)
+    peak = []
+    expand = space.expand
+
+    def counting(node):
+        peak.append(len(space.nodes))
+        return expand(node)
+
+    space.expand = counting
+    assert space.check('{0}[](p)', (0, 0))
+    assert space.expanded == 2 ** (depth + 1) - 1
+    assert max(peak) < 200
+
+
+def test_agrees_with_explicit_states():
+    import bench.generators as gen
+    import Fixpoint as F
+    from util import parse
+    owners, edges, labels = gen.random_game(60, seed=3)
+    succ = {}
+    for i, j in edges:
+        succ.setdefault(i, []).append(j)
+    props = {i: [p for p, members in labels.items() if i in members] for i in range(60)}
+    states = gen.states(owners, edges, labels)
+    for text in ('{a}<>(q)', '{b}[](p V q)', '{a,b}(p) U (q ^ {a}@(p))', '~{a}[](p)'):
+        want = F.label(parse(text), states)
+        got = [Local.check(text, i, lambda k: dict.fromkeys(succ.get(k, ())), props.__getitem__,
+                           owners.__getitem__) for i in range(60)]
+        assert got == want, text
@@ -0,0 +1,51 @@
+import contextlib
+import io
+from multiprocessing import shared_memory
+import pytest
+import Game as G
+import Parallel as P
+from reference import label, random_formula, random_states
+
+with contextlib.redirect_stdout(io.StringIO()):  # ATL prints its walkthrough example on import
+    import ATL
+
+
+def test_cluster_agrees_with_reference():
+    for seed in range(10):
+        states, r = random_states(seed, 40)
+        game = G.compile(states)
+        with P.Cluster(game, workers=3) as cluster:
+            for _ in range(5):
+                exp = random_formula(r, 4)
+                assert cluster.label(exp)[:len(states)] == label(exp, states), (seed, exp)
+
+
+def test_label_on_states():
+    states, r = random_states(7, 30)
+    exp = random_formula(r, 4)
+    assert P.label(exp, states, workers=2) == label(exp, states)
+
+
+def test_games_without_edges_or_states():
+    states, r = random_states(3, 12)
+    for s in states:
+        s.connections = []
+    for _ in range(5):
+        exp = random_formula(r, 3)
+        assert ATL.test(exp, states, 'parallel') == label(exp, states), exp
+        assert P.label(exp, states, workers=3) == label(exp, states), exp
+    assert P.label('{a}<>(p)', G.compile([]), workers=2) == []
+
+
+def test_close_frees_memory_after_a_worker_died():
+    states, _ = random_states(5, 20)
+    cluster = P.Cluster(G.compile(states), workers=2)
+    names = [block.name for block in cluster.blocks]
+    cluster.procs[0].kill()
+    cluster.procs[0].join()
+    with pytest.raises((EOFError, OSError)):
+        cluster.label('{a}[](p)')
+    cluster.close()
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name)
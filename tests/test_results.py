@@ -0,0 +1,79 @@
+import contextlib
+import io
+import Game as G
+import Results as R
+from util import TrainGate, parse
+
+with contextlib.redirect_stdout(io.StringIO()):  # ATL prints its walkthrough example on import
+    import ATL
+
+
+def stored(rc):
+    size, count = rc.db.execute('SELECT COALESCE(SUM(LENGTH(bits)), 0), COUNT(*) FROM results').fetchone()
+    return {'entries': count, 'bytes': size + R.ROW * count}
+
+
+def test_hits_match_fresh_checks(tmp_path):
+    tg = TrainGate()
+    rc = R.ResultCache(str(tmp_path / 'r.db'))
+    key = R.model_key(tg.states)
+    for exp in tg.examples:
+        want = ATL.test(exp, tg.states)
+        assert ATL.test(exp, tg.states, results=rc, model=key) == want
+        assert ATL.test(exp, tg.states, results=rc) == want
+        assert ATL.is_valid(exp, tg.states, results=rc, model=key) == all(want)
+    assert rc.stats()['hits'] >= len(tg.examples)
+    rc.close()
+
+
+def test_model_key_is_not_compiled_again(tmp_path, monkeypatch):
+    tg = TrainGate()
+    rc = R.ResultCache(str(tmp_path / 'r.db'))
+    key = R.model_key(tg.states)
+    exp = tg.examples[0]
+    ATL.test(exp, tg.states, results=rc, model=key)
+
+    def fail(states):
+        raise AssertionError('compiled on a hit')
+
+    monkeypatch.setattr(G, 'compile', fail)
+    assert ATL.test(exp, tg.states, results=rc, model=key) == ATL.test(exp, tg.states)
+    rc.close()
+
+
+def test_normal_form_shares_entries(tmp_path):
+    tg = TrainGate()
+    rc = R.ResultCache(str(tmp_path / 'r.db'))
+    ATL.test(parse('{t,c}[](oog V ig)'), tg.states, results=rc)
+    ATL.test(parse('{c,t}[](ig V oog)'), tg.states, results=rc)
+    assert rc.stats()['hits'] == 1
+    rc.close()
+
+
+def test_running_size_and_eviction(tmp_path):
+    tg = TrainGate()
+    path = str(tmp_path / 'r.db')
+    rc = R.ResultCache(path, limit=200)
+    for exp in tg.examples:
+        ATL.test(exp, tg.states, results=rc)
+        ATL.is_valid(exp, tg.states[:2], results=rc)
+        stats = rc.stats()
+        assert {'entries': stats['entries'], 'bytes': stats['bytes']} == stored(rc)
+        assert stats['bytes'] <= 200
+    rc.close()
+    reopened = R.ResultCache(path)
+    assert {k: v for k, v in reopened.stats().items() if k in ('entries', 'bytes')} == stored(reopened)
+    reopened.close()
+
+
+def test_use_times_are_written_on_close(tmp_path):
+    tg = TrainGate()
+    path = str(tmp_path / 'r.db')
+    rc = R.ResultCache(path)
+    ATL.test(tg.examples[0], tg.states, results=rc)
+    before = rc.db.execute('SELECT used FROM results').fetchone()[0]
+    ATL.test(tg.examples[0], tg.states, results=rc)
+    rc.close()
+    rc = R.ResultCache(path)
+    assert rc.db.execute('SELECT used FROM results').fetchone()[0] > before
+    rc.close()
@@ -0,0 +1,28 @@
+import Fixpoint as F
+import Game as G
+import Storage
+from reference import random_formula, random_states
+
+
+def test_saved_games_label_the_same(tmp_path):
+    for seed in range(30):
+        states, r = random_states(seed)
+        game = G.compile(states)
+        path = str(tmp_path / f'{seed}.game')
+        Storage.save(game, path)
+        exp = random_formula(r, 4)
+        for mapped in (True, False):
+            loaded = Storage.load(path, mapped)
+            assert loaded.fingerprint() == game.fingerprint()
+            assert F.label(exp, loaded) == F.label(exp, game), (seed, exp)
+
+
+def test_edge_lists_label_the_same(tmp_path):
+    for seed in range(30):
+        states, r = random_states(seed)
+        game = G.compile(states)
+        edges, state_path = str(tmp_path / f'{seed}.edges'), str(tmp_path / f'{seed}.states')
+        Storage.write_edges(edges, ((i, j) for i in range(game.size) for j in game.successors(i)))
+        Storage.write_states(state_path, [s.player for s in states], [s.props for s in states])
+        exp = random_formula(r, 4)
+        assert F.label(exp, Storage.load_edges(edges, state_path)) == F.label(exp, game), (seed, exp)
@@ -0,0 +1,72 @@
+import BDD as B
+import Fixpoint as F
+import Symbolic as Y
+from bench import generators as gen
+from util import parse
+from reference import random_formula, random_states
+
+TRAIN_GATE = ['{0}[]((oog ^ ~grant) -> {c,t}[](oog))', '{0}[](oog -> {c,t}<>(ig))',
+              '{0}[](oog -> {t}<>(req ^ ({c}<>(grant)) ^ ({c}[](~grant))))', '{0}[](ig -> {c}@(oog))',
+              '{t1}<>(ig1)', '{c,t1}<>(ig1)', '{c}(~ig) U (ig2)', '{t,c}[](~(ig ^ ig1))', 'oog V {c}@(req1)']
+
+
+def test_agrees_with_fixpoint_on_random_models():
+    for seed in range(200):
+        states, r = random_states(seed)
+        exp = random_formula(r, 4)
+        assert Y.label(exp, states) == F.label(exp, states), (seed, exp)
+
+
+def test_agrees_while_collecting_garbage():
+    import Game as G
+    for seed in range(40):
+        states, r = random_states(seed, 30)
+        exp = random_formula(r, 5)
+        game = G.compile(states)
+        model = Y.from_game(game)
+        model.bdd.threshold = 8
+        model.bdd.cache_limit = 50
+        got = [False] * game.size
+        for values in model.members(Y.sat(exp, model)):
+            got[values['state']] = True
+        assert got[:len(states)] == F.label(exp, states), (seed, exp)
+
+
+def test_train_gate_matches_explicit_product():
+    for n in (1, 2, 3):
+        game = gen.game(*gen.train_gate(n))
+        model = Y.train_gate(n)
+        assert model.count(model.states) == game.size
+        for text in TRAIN_GATE:
+            if n < 3 and '2' in text or n < 2 and '1' in text:
+                continue
+            exp = parse(text)
+            assert model.count(Y.sat(exp, model)) == sum(F.label(exp, game)), (n, text)
+
+
+def test_results_survive_later_checks():
+    model = Y.train_gate(6)
+    u = Y.sat('{t}<>(ig)', model)
+    count = model.count(u)
+    model.bdd.threshold = 10
+    Y.sat('{0}[](oog -> {c,t}<>(ig))', model)
+    assert Y.is_valid('{0}[]((oog ^ ~grant) -> {c,t}[](oog))', model)
+    assert model.bdd.collections
+    assert model.count(u) == count == 256
+    model.bdd.deref(u)
+
+
+def test_bdd_operations():
+    bdd = B.BDD()
+    x, y, z = (bdd.var(bdd.add_var()) for _ in range(3))
+    f = bdd.disj(bdd.conj(x, y), z)
+    assert bdd.neg(bdd.neg(f)) == f
+    assert bdd.conj(f, bdd.neg(f)) == B.FALSE
+    assert bdd.count(f, [0, 1, 2]) == 5
+    assert bdd.exists(f, bdd.cube([2])) == B.TRUE
+    assert bdd.and_exists(f, bdd.neg(z), bdd.cube([1])) == bdd.conj(x, bdd.neg(z))
+    assert sorted(bdd.assignments(f, [0, 1, 2])) == [1, 3, 5, 6, 7]
+    assert bdd.values([0, 1, 2], [1, 3, 5, 6, 7]) == f
+    bdd.ref(f)
+    bdd.collect()
+    assert bdd.count(f, [0, 1, 2]) == 5 and len(bdd) == 3
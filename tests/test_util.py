@@ -0,0 +1,29 @@
+import pytest
+from reference import label, random_formula, random_states
+from util import parse, parse_text
+
+
+def test_parse_repr_round_trip():
+    for seed in range(500):
+        states, r = random_states(seed)
+        exp = random_formula(r, 4)
+        again = parse(repr(exp))
+        assert again.normalize() is exp.normalize(), (seed, exp)
+        assert label(again, states) == label(exp, states)
+        assert parse(repr(again)) is again
+
+
+def test_parse_closes_open_groups_and_rejects_malformed_specs():
+    assert parse_text('{0}[](oog -> {c}@(ig') is parse('{0}[](oog -> {c}@(ig))')
+    assert parse_text('{a}(p U q') is parse('{a}(p) U (q)')
+    for text in ('', 'p ^', '{a}(p)', 'p q', 'p U q', ')', 'p $', '{a}[](p) U (q)'):
+        with pytest.raises(ValueError):
+            parse_text(text)
+
+
+def test_parse_deep_nesting():
+    text = 'p'
+    for _ in range(5000):
+        text = f'{{a}}[]({text})'
+    exp = parse_text(text)
+    assert repr(exp) == text
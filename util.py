@@ -1,209 +1,248 @@
-import Expressions as E
-import States as S
-from Expressions import Exp
-import re
-# v5, handles constants and diamond, handles missing parens, implements a class to encompass the Train-Gate problem
-
-'''Expression String Representation Syntax
-    
-    Regular Operators:
-        Constant    :   "true"
-                        "false"
-        Proposition :   any string of characters
-        Negation    :   ~
-        Disjunction :   V
-        Conjunction :   ^
-        Implication :   ->
-        
-    Path Quantifiers:
-        Players :   {_}
-                    {_,...}
-                    {} or {0}
-                    
-        *   If players is parametrized with "0", i.e. "{0}", it will behave
-            the same as {} as 0 is the symbol for null.
-        *   Path Quantifiers must apply to expressions within parenthesis,
-            for example, "{c}[](oog)" is legal but "{c}[]oog" is not.
-        
-    Temporal Operators:
-        Circle  :   @
-        Diamond :   <>
-        Square  :   []
-        Until   :   U
-        
-        *   Circle, Diamond, and Square apply from the left of an expression, 
-            Until is infix.
-        *   Temporal Operators must apply to expressions within parenthesis,
-            for example, "{c}[](oog)" is legal but "{c}[]oog" is not.
-        *   Temporal Operators can only come after Path Quantifiers. 
-            Until looks like {_}(exp1 U exp2).
-        
-        
-    
-'''
-
-
-def tokenize(text):
-    return re.findall(r'[()~^vU@]|\[\]|<>|\{.*?\}|->|true|false|\w+', text)
-
-
-def neg_if_nec(expression, operator_stack):
-    # preempts future negation
-    if operator_stack and operator_stack[-1] == '~':
-        operator_stack.pop()
-        return Exp(expression, op=E.NEG)
-    else:
-        return expression
-
-
-def construct_expression(subexpressions, operators, op_table):
-    expression = None
-    while subexpressions:
-        sub1 = subexpressions.pop()
-        sub2 = subexpressions.pop() if subexpressions else None
-        op = operators.pop() if operators else None
-        if operators:
-            subexpressions.append(Exp(sub1, sub2, op=op_table[op]) if op and sub2 else sub1)
-        else:
-            expression = Exp(sub1, sub2, op=op_table[op]) if op and sub2 else sub1
-    return expression
-
-
-def hacky_leftover_parse(estack, ostack, otable):
-    e = []
-    o = []
-    while ostack:
-        op = ostack.pop()
-        if op == '$':
-            e.append(neg_if_nec(estack.pop(), ostack))
-        elif op in otable:
-            o.append(op)
-    # construct expression from sub expressions
-    return construct_expression(e, o, otable)
-
-
-def parse(text):
-    op_table = {'~': E.NEG, '^': E.CONJ, 'V': E.DISJ, '->': E.IMPL, }  # operator lookup table
-    temp_op_table = {'#': E.SQUARE, '[]': E.SQUARE, '@': E.CIRCLE, 'U': E.UNTIL, '<>': E.DIAMOND}  # temporal operator lookup table
-    exp_stack = []  # expression stack
-    op_stack = []  # operator stack
-    quant_stack = []  # path quantifier and temporal operator stack
-
-    for token in tokenize(text):
-        if token == 'true' or token == 'false':
-            val = True if token == 'true' else False
-            exp_stack.append(Exp(val, op=E.CONST))
-            op_stack.append('$')
-        # Left Parenthesis
-        elif token == '(':
-            op_stack.append(token)
-        # Right Parenthesis: end of expression
-        elif token == ')':
-            curr_ops = []  # constituent operator stack
-            curr_exps = []  # constituent expression stack
-            op = op_stack.pop()
-            # iterate to start of expression
-            while op != '(':
-                # push expression to constituent expressions stack
-                if op == '$':
-                    curr_exps.append(neg_if_nec(exp_stack.pop(), op_stack))
-                # push operator to constituent operators stack
-                elif op in op_table:
-                    curr_ops.append(op)
-                op = op_stack.pop()
-            # construct expression from sub expressions
-            exp_stack.append(construct_expression(curr_exps, curr_ops, op_table))
-            # apply path quantifiers and temporal operators
-            if op_stack and op_stack[-1] in temp_op_table:
-                tempop = quant_stack.pop()
-                if tempop != E.UNTIL and tempop != E.DIAMOND:  # Circle or Square
-                    exp_stack.append(Exp(exp_stack.pop(), op=(tempop, quant_stack.pop())))
-                    op_stack.pop()
-                    if op_stack[-1] == '%':
-                        op_stack.pop()
-                else:  # Diamond or Until
-                    sub2 = exp_stack.pop()
-                    if tempop == E.DIAMOND:
-                        # {A}<>Exp == {A}true U exp
-                        sub1 = Exp(True, op=E.CONST)
-                        tempop = E.UNTIL
-                    else:
-                        sub1 = exp_stack.pop()
-                    exp_stack.append(Exp(sub1, sub2, op=(tempop, quant_stack.pop())))
-                    # strip operators left of subexp1
-                    if op_stack[-1] == 'U':
-                        op_stack.pop()  # remove U
-                        if op_stack[-1] == '$':
-                            op_stack.pop()  # remove $
-                            if op_stack[-1] == '%':
-                                op_stack.pop()  # remove %
-                                continue
-
-            # push expression symbol to operator stack
-            op_stack.append('$')
-        # Operator
-        elif token in op_table:
-            op_stack.append(token)
-            if token == 'U':
-                quant_stack.append(op_table[token])
-        # Path Quantifier
-        elif token[0] == '{':
-            token = [] if token[1:len(token) - 1] == '0' else token[1:len(token) - 1].split(',')
-            quant_stack.append(token)
-            op_stack.append('%')
-        # Temporal Operator
-        elif token in temp_op_table:
-            quant_stack.append(temp_op_table[token])
-            op_stack.append(token if token != '[]' else '#')
-        # Proposition
-        else:
-            exp_stack.append(Exp(token))
-            op_stack.append('$')
-
-    if op_stack:  # handles leftover symbols caused by missing parens
-        exp_stack.append(hacky_leftover_parse(exp_stack, op_stack, op_table))
-
-    return exp_stack.pop()
-
-
-# Wrapper for the Train-Gate Problem and examples from the Bloisi slides
-class TrainGate:
-    def __init__(self):
-        self.players = ['c', 't']
-        q0 = S.State(['oog'], 't')
-        q1 = S.State(['oog', 'req'], 'c')
-        q2 = S.State(['oog', 'grant'], 't')
-        q3 = S.State(['ig'], 'c')
-        q0.connect([q0, q1])
-        q1.connect([q0, q1, q2])
-        q2.connect([q0, q3])
-        q3.connect([q0, q3])
-        self.states = [q0, q1, q2, q3]
-
-        t1 = 'Whenever the train is out of the gate and does not have a grant to enter the gate, ' \
-             'the controller can prevent it from entering the gate.'
-        ex1 = '{0}[]((oog ^ ~grant) -> {c,t}[](oog))'
-        t3 = 'Whenever the train is out of the gate, the train and the controller' \
-             'can cooperate so that the train will enter the gate.'
-        ex3 = '{0}[](oog -> {c,t}<>(ig))'
-        t4 = 'Whenever the train is out of the gate, it can eventually request a grant for entering the gate, ' \
-             'in which case the controller decides whether the grant is given or not.'
-        ex4 = '{0}[](oog -> {t}<>(req ^ ({c}<>(grant)) ^ ({c}[](~grant)))'
-        t5 = 'Whenever the train is in the gate, the controller can force it out in the next step.'
-        ex5 = '{0}[](ig -> {c}@(oog))'
-        self.descriptions = [t1, t3, t4, t5]
-        self.examples = list(map(parse, [ex1, ex3, ex4, ex5]))
-
-    def eval(self, f, e=None, s=None):
-        return f(e, s)
-
-    def print(self, f):
-        import textwrap
-        for ex, t in zip(self.examples, self.descriptions):
-            print(f'"{textwrap.fill(t, width=75)}"\n'
-                  f'Expression:\t{ex}\n'
-                  f'{f.__name__}:\t{self.eval(f, ex, s=self.states)}\n')
-
-    def add_example(self, e, t=None):
-        self.examples.append(parse(e))
-        self.descriptions.append(t if t else 'No text for example.')
+import Expressions as E
+import States as S
+from Expressions import Exp
+import functools
+import re
+# v5, handles constants and diamond, handles missing parens, implements a class to encompass the Train-Gate problem
+
+'''Expression String Representation Syntax
+    
+    Regular Operators:
+        Constant    :   "true"
+                        "false"
+        Proposition :   any string of characters
+        Negation    :   ~
+        Disjunction :   V
+        Conjunction :   ^
+        Implication :   ->
+        
+    Path Quantifiers:
+        Players :   {_}
+                    {_,...}
+                    {} or {0}
+                    
+        *   If players is parametrized with "0", i.e. "{0}", it will behave
+            the same as {} as 0 is the symbol for null.
+        *   Path Quantifiers must apply to expressions within parenthesis,
+            for example, "{c}[](oog)" is legal but "{c}[]oog" is not.
+        
+    Temporal Operators:
+        Circle  :   @
+        Diamond :   <>
+        Square  :   []
+        Until   :   U
+        
+        *   Circle, Diamond, and Square apply from the left of an expression, 
+            Until is infix.
+        *   Temporal Operators must apply to expressions within parenthesis,
+            for example, "{c}[](oog)" is legal but "{c}[]oog" is not.
+        *   Temporal Operators can only come after Path Quantifiers. 
+            Until looks like {_}(exp1) U (exp2) or {_}(exp1 U exp2).
+        
+        
+    
+'''
+
+
+# Tokens, whole words only so propositions like "valid" or "Until" stay intact
+TOKEN = re.compile(r'\[\]|<>|->|[()~^@]|\{[^{}]*\}|\w+|\S')
+BINARY = {'^': E.CONJ, 'V': E.DISJ, '->': E.IMPL}
+TEMPORAL = {'[]': E.SQUARE, '@': E.CIRCLE, '<>': E.DIAMOND}
+CONSTANTS = {'true': True, 'false': False, 'True': True, 'False': False}  # repr writes True and False
+
+# Prefixes waiting for the next operand of a group
+NOT = 0  # ~
+QUANT = 1  # {A} with no temporal operator yet, the operand is the left side of an Until
+LEFT = 2  # {A}(left) U, waiting for the right side
+OPEN = 3  # (, only in OPERANDS
+
+# Tokens that start an operand and aren't names or player sets
+OPERANDS = {'~': NOT, '(': OPEN}
+OPERANDS.update({token: E.CONST for token in CONSTANTS})
+
+
+def tokenize(text):
+    return TOKEN.findall(text)
+
+
+def parse_players(token):
+    names = [p.strip() for p in token[1:-1].split(',')]
+    return [] if names == ['0'] or names == [''] else names
+
+
+def parse_text(text):
+    # Precedence climbing over one pass of the tokens. All binary operators have the same precedence and
+    #  group to the left; ~ and path quantifiers bind to the next operand. The group being read is kept in
+    #  locals: left is the expression so far, op a binary operator waiting for its right side, prefix the
+    #  unary operators waiting for the next operand, until the left side when the group reads
+    #  {A}(left U right). Enclosing groups live on an explicit stack, so nesting depth is only limited by
+    #  memory. Groups still open at the end are closed (missing parens), as the old parser did.
+    tokens = TOKEN.findall(text)
+    n = len(tokens)
+    stack = []  # enclosing groups, (left, op, prefix, until_ok, until)
+    left = op = until = None
+    prefix = []
+    until_ok = False
+    expect_operand = True
+    k = 0
+    while True:
+        if k < n:
+            token = tokens[k]
+            k += 1
+        elif expect_operand:
+            raise ValueError(f'Incomplete expression {text!r}')
+        elif stack:
+            token = None  # closes a group left open
+        else:
+            break
+
+        if expect_operand:
+            kind = OPERANDS.get(token)
+            if kind is None:
+                first = token[0]
+                if first == '{':
+                    players = parse_players(token)
+                    if k < n and tokens[k] in TEMPORAL:
+                        prefix.append((TEMPORAL[tokens[k]], players))
+                        k += 1
+                    else:
+                        prefix.append((QUANT, players))
+                    continue
+                if (first.isalnum() or first == '_') and token not in BINARY and token != 'U':
+                    operand = Exp(token)
+                elif token in BINARY or token in '()~^@U' or token in TEMPORAL:
+                    raise ValueError(f'Expected an expression before {token!r} in {text!r}')
+                else:
+                    raise ValueError(f'Unexpected character {token!r} in {text!r}')
+            elif kind == NOT:
+                prefix.append((NOT, None))
+                continue
+            elif kind == OPEN:
+                stack.append((left, op, prefix, until_ok, until))
+                until_ok = bool(prefix) and prefix[-1][0] == QUANT
+                left = op = until = None
+                prefix = []
+                continue
+            else:
+                operand = Exp(CONSTANTS[token], op=E.CONST)
+        elif prefix:  # only U can follow {A}(left)
+            if token != 'U':
+                if token is None:
+                    raise ValueError(f'Incomplete expression in parentheses in {text!r}')
+                raise ValueError(f'Expected U before {token!r} in {text!r}')
+            expect_operand = True
+            continue
+        elif token in BINARY:
+            op = BINARY[token]
+            expect_operand = True
+            continue
+        elif token == 'U':
+            if until_ok and until is None:  # {A}(left U right)
+                until, left = left, None
+                expect_operand = True
+                continue
+            raise ValueError(f'Until without a path quantifier in {text!r}')
+        elif token == ')' or token is None:
+            if not stack:
+                raise ValueError(f'Unbalanced ")" in {text!r}')
+            operand = left if until is None else (until, left)
+            left, op, prefix, until_ok, until = stack.pop()
+        elif token in TEMPORAL or token in '(~@' or token[0] == '{' or token[0].isalnum() or token[0] == '_':
+            raise ValueError(f'Expected an operator before {token!r} in {text!r}')
+        else:
+            raise ValueError(f'Unexpected character {token!r} in {text!r}')
+
+        # a finished operand: to the prefixes of the group, then to its binary operator
+        while prefix:
+            kind, players = prefix[-1]
+            if kind == QUANT:
+                if type(operand) is tuple:  # {A}(left U right)
+                    prefix.pop()
+                    operand = Exp(operand[0], operand[1], op=(E.UNTIL, players))
+                    continue
+                prefix[-1] = (LEFT, (players, operand))
+                operand = None  # U comes next
+                break
+            if type(operand) is tuple:
+                raise ValueError(f'Until without a path quantifier in {text!r}')
+            prefix.pop()
+            if kind == NOT:
+                operand = Exp(operand, op=E.NEG)
+            elif kind == LEFT:
+                operand = Exp(players[1], operand, op=(E.UNTIL, players[0]))
+            elif kind == E.DIAMOND:  # {A}<>Exp == {A}true U exp
+                operand = Exp(Exp(True, op=E.CONST), operand, op=(E.UNTIL, players))
+            else:  # Circle or Square
+                operand = Exp(operand, op=(kind, players))
+        if operand is not None:
+            if type(operand) is tuple:
+                raise ValueError(f'Until without a path quantifier in {text!r}')
+            if op is not None:
+                left, op = Exp(left, operand, op=op), None
+            else:
+                left = operand
+        expect_operand = False
+
+    if prefix or left is None or op is not None:
+        raise ValueError(f'Incomplete expression in parentheses in {text!r}')
+    return left
+
+
+# Parsed expressions are interned, so the same string always gives the same Exp; the most recent
+#  formulas are kept so spec files that repeat them are parsed once. parse.cache_info() has the counts
+@functools.lru_cache(maxsize=1 << 16)
+def parse(text):
+    return parse_text(text)
+
+
+# Wrapper for the Train-Gate Problem and examples from the Bloisi slides
+class TrainGate:
+    def __init__(self):
+        self.players = ['c', 't']
+        q0 = S.State(['oog'], 't')
+        q1 = S.State(['oog', 'req'], 'c')
+        q2 = S.State(['oog', 'grant'], 't')
+        q3 = S.State(['ig'], 'c')
+        q0.connect([q0, q1])
+        q1.connect([q0, q1, q2])
+        q2.connect([q0, q3])
+        q3.connect([q0, q3])
+        self.states = [q0, q1, q2, q3]
+
+        t1 = 'Whenever the train is out of the gate and does not have a grant to enter the gate, ' \
+             'the controller can prevent it from entering the gate.'
+        ex1 = '{0}[]((oog ^ ~grant) -> {c,t}[](oog))'
+        t3 = 'Whenever the train is out of the gate, the train and the controller' \
+             'can cooperate so that the train will enter the gate.'
+        ex3 = '{0}[](oog -> {c,t}<>(ig))'
+        t4 = 'Whenever the train is out of the gate, it can eventually request a grant for entering the gate, ' \
+             'in which case the controller decides whether the grant is given or not.'
+        ex4 = '{0}[](oog -> {t}<>(req ^ ({c}<>(grant)) ^ ({c}[](~grant)))'
+        t5 = 'Whenever the train is in the gate, the controller can force it out in the next step.'
+        ex5 = '{0}[](ig -> {c}@(oog))'
+        self.descriptions = [t1, t3, t4, t5]
+        self.examples = list(map(parse, [ex1, ex3, ex4, ex5]))
+
+    def eval(self, f, e=None, s=None, profile=None, results=None, model=None):
+        options = {k: v for k, v in (('profile', profile), ('results', results), ('model', model)) if v is not None}
+        return f(e, s, **options)
+
+    def print(self, f, profile=False, results=None):
+        # with profile, f has to take a profile argument (like ATL.test and ATL.is_valid) and the
+        #  statistics of each example are shown below its result
+        # results (a Results.ResultCache) is handed to f, so stored results are shown without checking again,
+        #  with the model fingerprint made once for all the examples
+        import textwrap
+        import Results
+        model = Results.model_key(self.states) if results is not None else None
+        for ex, t in zip(self.examples, self.descriptions):
+            stats = E.Profile() if profile else None
+            print(f'"{textwrap.fill(t, width=75)}"\n'
+                  f'Expression:\t{ex}\n'
+                  f'{f.__name__}:\t{self.eval(f, ex, s=self.states, profile=stats, results=results, model=model)}\n')
+            if stats is not None:
+                print(f'{stats}\n')
+
+    def add_example(self, e, t=None):
+        self.examples.append(parse(e))
+        self.descriptions.append(t if t else 'No text for example.')